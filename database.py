@@ -0,0 +1,283 @@
+import logging
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import asyncpg
+
+from metrics import record_db_time
+
+async def migrate(pool, path):
+    '''
+    Applies all pending migrations found in path to the database, in order, within a single transaction
+    Migrations are .sql files named in the format of NNNN_description.sql, where NNNN is the schema version they upgrade to
+    Returns the schema version of the database after migrating
+    '''
+    start = time.perf_counter()
+    migrations = {}
+    for file in Path(path).glob("*.sql"):
+        version = int(file.name.split("_")[0])
+        if version in migrations:
+            raise RuntimeError(f"Duplicate migration version {version}: {migrations[version].name}, {file.name}")
+        migrations[version] = file
+
+    async with pool.acquire() as con:
+        async with con.transaction():
+            await con.execute('''
+            CREATE TABLE IF NOT EXISTS public.schema_version
+            (
+                version integer NOT NULL,
+                applied_at timestamp with time zone NOT NULL DEFAULT now(),
+                PRIMARY KEY (version)
+            )''')
+            #Prevent multiple instances from migrating at the same time
+            await con.execute('''LOCK TABLE schema_version IN EXCLUSIVE MODE''')
+            current_version = await con.fetchval('''SELECT max(version) FROM schema_version''') or 0
+            pending = [version for version in sorted(migrations.keys()) if version > current_version]
+            for version in pending:
+                logging.info(f"Applying migration {migrations[version].name}...")
+                await con.execute(migrations[version].read_text(encoding="utf-8"))
+                await con.execute('''INSERT INTO schema_version (version) VALUES ($1)''', version)
+                current_version = version
+
+    if pending:
+        logging.info(f"Migrated database to schema version {current_version} in {round((time.perf_counter() - start) * 1000, 2)}ms.")
+    else:
+        logging.info(f"Database schema is up to date. (version {current_version})")
+    return current_version
+
+
+class QueryRegistry():
+    '''
+    Central registry of named SQL statements, each statement is declared once by name & prepared once per connection
+    Also keeps track of how often each statement was executed, how long it took, and how many rows it returned
+    '''
+
+    @dataclass
+    class QueryStats:
+        '''
+        Represents the execution statistics of a single statement, times are in seconds
+        '''
+        calls:int=0
+        total_time:float=0.0
+        rows:int=0
+        #Only the most recent executions are kept for percentiles, so memory usage stays fixed
+        samples:deque=field(default_factory=lambda: deque(maxlen=1000))
+
+        @property
+        def p99(self):
+            if not self.samples:
+                return 0.0
+            samples = sorted(self.samples)
+            return samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    def __init__(self):
+        self.queries = {}
+        self.stats = {}
+        #Prepared statements per connection, in the format of server_pid:{name:statement}
+        self.prepared = {}
+
+    def register(self, name, query):
+        '''
+        Declares a statement under name, registering the same name again replaces the statement (e.g. on extension reload)
+        '''
+        if self.queries.get(name) != query:
+            for statements in self.prepared.values():
+                statements.pop(name, None)
+        self.queries[name] = query
+        if name not in self.stats:
+            self.stats[name] = self.QueryStats()
+
+    async def init_connection(self, con):
+        '''
+        Used as the init hook of the pool, prepares all statements registered so far on every new connection
+        Statements registered later are prepared on first use
+        '''
+        self.prepared[con.get_server_pid()] = {}
+        con.add_termination_listener(self._on_connection_closed)
+        await self._prepare_all(con)
+
+    async def prepare_pool(self, pool):
+        '''
+        Prepares all statements registered so far on every open connection of an asyncpg pool
+        The pool is created before extensions register their statements, so this is called once all of them were loaded
+        '''
+        connections = [await pool.acquire() for i in range(pool.get_size())]
+        try:
+            for con in connections:
+                await self._prepare_all(con)
+        finally:
+            for con in connections:
+                await pool.release(con)
+
+    async def _prepare_all(self, con):
+        for name in list(self.queries.keys()):
+            try:
+                await self._get_statement(con, name)
+            except asyncpg.PostgresError as error:
+                logging.warning(f"Failed preparing statement '{name}', retrying on first use: {error}")
+
+    def _on_connection_closed(self, con):
+        self.prepared.pop(con.get_server_pid(), None)
+
+    async def _get_statement(self, con, name):
+        statements = self.prepared.setdefault(con.get_server_pid(), {})
+        if name not in statements:
+            statements[name] = await con.prepare(self.queries[name])
+        return statements[name]
+
+    def _record(self, con, name, duration, rows):
+        if isinstance(con, TrackedConnection):
+            con.db_time += duration
+        record_db_time(duration)
+        stats = self.stats[name]
+        stats.calls += 1
+        stats.total_time += duration
+        stats.rows += rows
+        stats.samples.append(duration)
+
+    async def fetch(self, con, name, *args):
+        statement = await self._get_statement(con, name)
+        start = time.perf_counter()
+        results = await statement.fetch(*args)
+        self._record(con, name, time.perf_counter() - start, len(results))
+        return results
+
+    async def fetchrow(self, con, name, *args):
+        statement = await self._get_statement(con, name)
+        start = time.perf_counter()
+        result = await statement.fetchrow(*args)
+        self._record(con, name, time.perf_counter() - start, 1 if result is not None else 0)
+        return result
+
+    async def fetchval(self, con, name, *args):
+        statement = await self._get_statement(con, name)
+        start = time.perf_counter()
+        result = await statement.fetchrow(*args)
+        self._record(con, name, time.perf_counter() - start, 1 if result is not None else 0)
+        if result is not None:
+            return result[0]
+
+    async def execute(self, con, name, *args):
+        '''
+        Executes a statement that does not return rows, returns the status of the statement, e.g. "DELETE 3"
+        The amount of rows affected is recorded as rows
+        '''
+        statement = await self._get_statement(con, name)
+        start = time.perf_counter()
+        await statement.fetch(*args)
+        status = statement.get_statusmsg()
+        affected = status.split()[-1] if status else ""
+        self._record(con, name, time.perf_counter() - start, int(affected) if affected.isdigit() else 0)
+        return status
+
+    def top(self, amount=10):
+        '''
+        Returns the most expensive statements by cumulative time, as a list of (name, QueryStats)
+        '''
+        return sorted(self.stats.items(), key=lambda item: item[1].total_time, reverse=True)[:amount]
+
+
+class TrackedConnection():
+    '''
+    Thin wrapper around a pool connection, keeps track of how much time was spent in the database while it was held
+    Everything else is passed through to the underlying connection
+    '''
+
+    timed_methods = frozenset(["fetch", "fetchrow", "fetchval", "execute", "executemany", "prepare", "copy_records_to_table", "copy_to_table"])
+
+    def __init__(self, con):
+        self._con = con
+        self.db_time = 0.0
+
+    def __getattr__(self, name):
+        attribute = getattr(self._con, name)
+        if name not in self.timed_methods:
+            return attribute
+
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await attribute(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                self.db_time += duration
+                record_db_time(duration)
+        return timed
+
+
+class InstrumentedPool():
+    '''
+    Wraps an asyncpg pool, recording how long each call site waited for, and held a connection
+    Logs a warning if a connection was held while not talking to the database for longer than hold_warn_threshold seconds,
+    e.g. because a listener awaited a Discord API call while holding it
+    '''
+
+    @dataclass
+    class AcquireStats:
+        '''
+        Represents the connection usage of a single call site, times are in seconds
+        '''
+        acquires:int=0
+        wait_time:float=0.0
+        max_wait:float=0.0
+        hold_time:float=0.0
+        max_hold:float=0.0
+        slow_holds:int=0
+
+    def __init__(self, pool, hold_warn_threshold=1.0):
+        self.pool = pool
+        self.hold_warn_threshold = hold_warn_threshold
+        self.stats = {}
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+    def acquire(self):
+        '''
+        Used the same way as asyncpg.Pool.acquire(), via async with
+        '''
+        frame = sys._getframe(1)
+        call_site = f"{Path(frame.f_code.co_filename).stem}.{frame.f_code.co_name}"
+        return self._acquire(call_site)
+
+    @asynccontextmanager
+    async def _acquire(self, call_site):
+        start = time.perf_counter()
+        async with self.pool.acquire() as con:
+            acquired = time.perf_counter()
+            tracked = TrackedConnection(con)
+            try:
+                yield tracked
+            finally:
+                self._record(call_site, acquired - start, time.perf_counter() - acquired, tracked.db_time)
+
+    def _record(self, call_site, wait, hold, db_time):
+        if call_site not in self.stats:
+            self.stats[call_site] = self.AcquireStats()
+        stats = self.stats[call_site]
+        stats.acquires += 1
+        stats.wait_time += wait
+        stats.max_wait = max(stats.max_wait, wait)
+        stats.hold_time += hold
+        stats.max_hold = max(stats.max_hold, hold)
+        if hold - db_time > self.hold_warn_threshold:
+            stats.slow_holds += 1
+            logging.warning(f"{call_site} held a database connection for {round(hold, 2)}s, of which only {round(db_time, 2)}s were spent in the database.")
+
+    def top(self, amount=10):
+        '''
+        Returns the call sites that waited the longest for a connection, as a list of (call_site, AcquireStats)
+        '''
+        return sorted(self.stats.items(), key=lambda item: item[1].wait_time, reverse=True)[:amount]
+
+
+async def create_pool(dsn, *, hold_warn_threshold=1.0, **kwargs):
+    '''
+    Creates an InstrumentedPool, kwargs are passed on to asyncpg.create_pool()
+    '''
+    pool = await asyncpg.create_pool(dsn=dsn, **kwargs)
+    return InstrumentedPool(pool, hold_warn_threshold=hold_warn_threshold)
@@ -16,20 +16,10 @@ async def hasPriviliged(ctx):
 
 class AdminCommands(commands.Cog, name="Admin Commands"):
     def __init__(self, bot):
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.priviliged
-                (
-                    guild_id bigint NOT NULL,
-                    priviliged_role_id bigint NOT NULL,
-                    PRIMARY KEY (guild_id, priviliged_role_id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(1)
         self.bot = bot
+        bot.queries.register("priviliged.add", '''INSERT INTO priviliged (guild_id, priviliged_role_id) VALUES ($1, $2)''')
+        bot.queries.register("priviliged.remove", '''DELETE FROM priviliged WHERE guild_id = $1 AND priviliged_role_id = $2''')
         if self.bot.lang == "de":
             de = gettext.translation('admin_commands', localedir=self.bot.localePath, languages=['de'])
             de.install()
@@ -115,9 +105,7 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
         Members with these roles can execute commands to set up and
         configure the bot. Note: Some commands may require additional permissions
         '''
-        async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT priviliged_role_id FROM priviliged WHERE guild_id = $1''', ctx.guild.id)
-        roleIDs = [result.get('priviliged_role_id') for result in results]
+        roleIDs = (await self.bot.guild_configs.get(ctx.guild.id)).priviliged_role_ids
         if len(roleIDs) == 0 :
             embed=discord.Embed(title="❌ Error: No priviliged roles set.", description=f"You can add a priviliged role via `{ctx.prefix}priviligedrole add <rolename>`.", color=self.bot.errorColor)
             await ctx.channel.send(embed=embed)
@@ -142,19 +130,16 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
             embed=discord.Embed(title="❌ Error: Role not found.", description=f"Unable to locate role, please make sure typed everything correctly.\n__Note:__ Rolenames are case-sensitive.", color=self.bot.errorColor)
             await ctx.channel.send(embed=embed)
             return
-        async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT priviliged_role_id FROM priviliged WHERE guild_id = $1''', ctx.guild.id)
-            privroles = [result.get('priviliged_role_id') for result in results]
-            #privroles = [role for role in roleIDs]
-            if role.id in privroles :
-                embed=discord.Embed(title="❌ Error: Role already added.", description=f"This role already has priviliged access.", color=self.bot.errorColor)
-                await ctx.channel.send(embed=embed)
-            else :
-                #await self.db.execute("INSERT INTO priviliged (guild_id, priviliged_role_id) VALUES (?, ?)", [ctx.guild.id, role.id])
-                await con.execute('''INSERT INTO priviliged (guild_id, priviliged_role_id) VALUES ($1, $2)''', ctx.guild.id, role.id)
-                #await self.db.commit()
-                embed=discord.Embed(title="✅ Priviliged access granted.", description=f"**{role.name}** has been granted bot admin priviliges.", color=self.bot.embedGreen)
-                await ctx.channel.send(embed=embed)
+        config = await self.bot.guild_configs.get(ctx.guild.id)
+        if role.id in config.priviliged_role_ids :
+            embed=discord.Embed(title="❌ Error: Role already added.", description=f"This role already has priviliged access.", color=self.bot.errorColor)
+            await ctx.channel.send(embed=embed)
+        else :
+            async with self.bot.pool.acquire() as con:
+                await self.bot.queries.execute(con, "priviliged.add", ctx.guild.id, role.id)
+            config.priviliged_role_ids = config.priviliged_role_ids | {role.id}
+            embed=discord.Embed(title="✅ Priviliged access granted.", description=f"**{role.name}** has been granted bot admin priviliges.", color=self.bot.embedGreen)
+            await ctx.channel.send(embed=embed)
 
 
     @priviligedrole.command(aliases=['rem', 'del', 'delete'], help="Remove role from priviliged roles.", description="Removes a role to the list of priviliged roles, revoking their permission to execute admin commands.", usage=f"priviligedrole remove <rolename>")
@@ -165,16 +150,16 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
             embed=discord.Embed(title="❌ Error: Role not found.", description=f"Unable to locate role, please make sure typed everything correctly.\n__Note:__ Rolenames are case-sensitive.", color=self.bot.errorColor)
             await ctx.channel.send(embed=embed)
             return
-        async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT priviliged_role_id FROM priviliged WHERE guild_id = $1''', ctx.guild.id)
-            privroles = [result.get('priviliged_role_id') for result in results]
-            if role.id not in privroles :
-                embed=discord.Embed(title="❌ Error: Role not priviliged.", description=f"This role is not priviliged.", color=self.bot.errorColor)
-                await ctx.channel.send(embed=embed)
-            else :
-                await con.execute('''DELETE FROM priviliged WHERE guild_id = $1 AND priviliged_role_id = $2''', ctx.guild.id, role.id)
-                embed=discord.Embed(title="✅ Priviliged access revoked.", description=f"**{role}** has had it's bot admin priviliges revoked.", color=self.bot.embedGreen)
-                await ctx.channel.send(embed=embed)
+        config = await self.bot.guild_configs.get(ctx.guild.id)
+        if role.id not in config.priviliged_role_ids :
+            embed=discord.Embed(title="❌ Error: Role not priviliged.", description=f"This role is not priviliged.", color=self.bot.errorColor)
+            await ctx.channel.send(embed=embed)
+        else :
+            async with self.bot.pool.acquire() as con:
+                await self.bot.queries.execute(con, "priviliged.remove", ctx.guild.id, role.id)
+            config.priviliged_role_ids = config.priviliged_role_ids - {role.id}
+            embed=discord.Embed(title="✅ Priviliged access revoked.", description=f"**{role}** has had it's bot admin priviliges revoked.", color=self.bot.embedGreen)
+            await ctx.channel.send(embed=embed)
 
 
 
@@ -195,6 +180,54 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
             embed = discord.Embed(title="❌ Error: Unable to change nickname.", description=f"This could be due to a permissions issue.", color=self.bot.errorColor)
             await ctx.send(embed=embed)
 
+    @commands.command(hidden=True, help="Shows cache statistics.", description="Shows how often priviliged role checks, and the guild config cache as a whole (also used by prefixes and logging), were hit or missed since startup.", usage="cachestats")
+    @commands.is_owner()
+    async def cachestats(self, ctx):
+        cache = self.bot.guild_configs
+        lookups = cache.hits + cache.misses
+        hit_ratio = round(cache.hits / lookups * 100, 2) if lookups else 0
+        checks = self.bot.CommandChecks
+        priviliged_lookups = checks.priviliged_hits + checks.priviliged_misses
+        priviliged_ratio = round(checks.priviliged_hits / priviliged_lookups * 100, 2) if priviliged_lookups else 0
+        embed=discord.Embed(title="📊 Guild config cache", description=f"**Cached guilds:** `{len(cache.configs)}`\n\n**Priviliged role checks:**\nHits: `{checks.priviliged_hits}` Misses: `{checks.priviliged_misses}` Hit ratio: `{priviliged_ratio}%`\n\n**All config lookups:**\nHits: `{cache.hits}` Misses: `{cache.misses}` Hit ratio: `{hit_ratio}%`", color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True, help="Shows query statistics.", description="Shows the statements that spent the most time in the database since startup, along with their call count, p99 latency and rows returned.", usage="querystats [amount]")
+    @commands.is_owner()
+    async def querystats(self, ctx, amount:int=10):
+        text = ""
+        for name, stats in self.bot.queries.top(min(amount, 15)):
+            if stats.calls == 0:
+                continue
+            text = f"{text}**{name}**\nCalls: `{stats.calls}` Total: `{round(stats.total_time * 1000, 2)}ms` Avg: `{round(stats.total_time / stats.calls * 1000, 2)}ms` p99: `{round(stats.p99 * 1000, 2)}ms` Rows: `{stats.rows}`\n"
+        if text == "":
+            text = "No statements were executed yet."
+        embed=discord.Embed(title="📊 Top statements by cumulative time", description=text, color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True, help="Shows connection pool statistics.", description="Shows the size of the database connection pool, and which parts of the bot waited for, or held connections the longest.", usage="poolstats [amount]")
+    @commands.is_owner()
+    async def poolstats(self, ctx, amount:int=10):
+        pool = self.bot.pool
+        text = f"**Pool size:** `{pool.get_size()}` (`{pool.get_idle_size()}` idle)\n\n"
+        for call_site, stats in pool.top(min(amount, 15)):
+            text = f"{text}**{call_site}**\nAcquires: `{stats.acquires}` Wait: `{round(stats.wait_time * 1000, 2)}ms` (max `{round(stats.max_wait * 1000, 2)}ms`) Hold: `{round(stats.hold_time * 1000, 2)}ms` (max `{round(stats.max_hold * 1000, 2)}ms`) Slow holds: `{stats.slow_holds}`\n"
+        embed=discord.Embed(title="📊 Connection pool", description=text, color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True, help="Shows the slowest listeners & commands.", description="Shows the slowest listeners & commands of the last hour by p99, along with the average time they spent in the database & Discord API calls.", usage="perf [amount]")
+    @commands.is_owner()
+    async def perf(self, ctx, amount:int=10):
+        text = ""
+        for (kind, name), stats in self.bot.perf.slowest(min(amount, 15)):
+            p99 = stats.percentile(99)
+            p99 = f"≤{round(p99 * 1000, 2)}ms" if p99 != float("inf") else ">10s"
+            text = f"{text}**{name}** ({kind})\nRuns: `{stats.count}` Avg: `{round(stats.wall_time / stats.count * 1000, 2)}ms` p99: `{p99}` DB: `{round(stats.db_time / stats.count * 1000, 2)}ms` HTTP: `{round(stats.http_time / stats.count * 1000, 2)}ms` Errors: `{stats.errors}`\n"
+        if text == "":
+            text = "Nothing was executed in the last hour."
+        embed=discord.Embed(title="📊 Slowest listeners & commands (last hour)", description=text, color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
+
     @commands.command(help="Shut down the bot.", description="Shuts the bot down properly and closes all pending connections.", usage="shutdown")
     @commands.is_owner()
     async def shutdown(self, ctx):
@@ -213,10 +246,8 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
         '''
         Prefix management commands/features are found here
         '''
-        async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT prefix FROM global_config WHERE guild_id = $1''', ctx.guild.id)
-        if results[0].get('prefix'):
-            prefixes = results[0].get('prefix')
+        prefixes = (await self.bot.guild_configs.get(ctx.guild.id)).prefix
+        if prefixes:
             desc = ""
             for prefix in prefixes:
                 desc = f"{desc}**#{prefixes.index(prefix)}** - `{prefix}` \n"
@@ -230,37 +261,30 @@ class AdminCommands(commands.Cog, name="Admin Commands"):
     @commands.check(hasPriviliged)
     @commands.guild_only()
     async def add_prefix(self, ctx, *, prefix:str):
-        async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT prefix FROM global_config WHERE guild_id = $1''', ctx.guild.id)
-
-            if results[0].get('prefix') is None or prefix not in results[0].get('prefix') and len(results[0].get('prefix')) <= 5:
-                await con.execute('''
-                UPDATE global_config SET prefix = array_append(prefix,$1) WHERE guild_id = $2
-                ''', prefix, ctx.guild.id)
-                embed = discord.Embed(title="✅ Prefix added", description=f"Prefix **{prefix}** has been added to the list of valid prefixes.\n\n**Note:** Setting a custom prefix disables the default prefix. If you forget your prefix, mention the bot!", color=self.bot.embedGreen)
-                await ctx.send(embed=embed)
-            elif prefix in results[0].get('prefix'):
-                embed=discord.Embed(title="❌ Prefix already added", description=f"This prefix is already added.", color=self.bot.errorColor)
-                await ctx.send(embed=embed)
-            elif len(results[0].get('prefix')) > 5:
-                embed=discord.Embed(title="❌ Too many prefixes", description=f"This server has reached the maximum amount of prefixes.", color=self.bot.errorColor)
-                await ctx.send(embed=embed)
+        prefixes = (await self.bot.guild_configs.get(ctx.guild.id)).prefix or []
+        if prefix in prefixes:
+            embed=discord.Embed(title="❌ Prefix already added", description=f"This prefix is already added.", color=self.bot.errorColor)
+            await ctx.send(embed=embed)
+        elif len(prefixes) > 5:
+            embed=discord.Embed(title="❌ Too many prefixes", description=f"This server has reached the maximum amount of prefixes.", color=self.bot.errorColor)
+            await ctx.send(embed=embed)
+        else:
+            await self.bot.global_config.add_prefix(ctx.guild.id, prefix)
+            embed = discord.Embed(title="✅ Prefix added", description=f"Prefix **{prefix}** has been added to the list of valid prefixes.\n\n**Note:** Setting a custom prefix disables the default prefix. If you forget your prefix, mention the bot!", color=self.bot.embedGreen)
+            await ctx.send(embed=embed)
 
     @prefix.command(name="del", aliases=["remove", "delete"], help="Removes a prefix.", description="Removes a prefix from the list of valid prefixes.", usage="prefix del <prefix>")
     @commands.check(hasPriviliged)
     @commands.guild_only()
     async def del_prefix(self, ctx, *, prefix:str):
-        async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT prefix FROM global_config WHERE guild_id = $1''', ctx.guild.id)
-            if results[0].get('prefix') is not None and prefix in results[0].get('prefix'):
-                await con.execute('''
-                UPDATE global_config SET prefix = array_remove(prefix,$1) WHERE guild_id = $2
-                ''', prefix, ctx.guild.id)
-                embed = discord.Embed(title="✅ Prefix added", description=f"Prefix **{prefix}** has been removed from the list of valid prefixes.\n\n**Note:** Removing all custom prefixes will re-enable the default prefix. If you forget your prefix, mention the bot!", color=self.bot.embedGreen)
-                await ctx.send(embed=embed)
-            elif prefix not in results[0].get('prefix'):
-                embed=discord.Embed(title="❌ Prefix not found", description=f"The specified prefix cannot be removed as it is not found.", color=self.bot.errorColor)
-                await ctx.send(embed=embed)
+        prefixes = (await self.bot.guild_configs.get(ctx.guild.id)).prefix or []
+        if prefix in prefixes:
+            await self.bot.global_config.remove_prefix(ctx.guild.id, prefix)
+            embed = discord.Embed(title="✅ Prefix added", description=f"Prefix **{prefix}** has been removed from the list of valid prefixes.\n\n**Note:** Removing all custom prefixes will re-enable the default prefix. If you forget your prefix, mention the bot!", color=self.bot.embedGreen)
+            await ctx.send(embed=embed)
+        else:
+            embed=discord.Embed(title="❌ Prefix not found", description=f"The specified prefix cannot be removed as it is not found.", color=self.bot.errorColor)
+            await ctx.send(embed=embed)
 
 
 
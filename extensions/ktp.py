@@ -13,22 +13,14 @@ class KeepOnTop(commands.Cog, name="Keep On Top"):
     
     def __init__(self, bot):
         self.bot = bot
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.ktp
-                (
-                    guild_id bigint NOT NULL,
-                    ktp_id serial NOT NULL,
-                    ktp_channel_id bigint NOT NULL,
-                    ktp_msg_id bigint NOT NULL,
-                    ktp_content text NOT NULL,
-                    PRIMARY KEY (guild_id, ktp_id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(1)
+        bot.queries.register("ktp.get_all", '''SELECT * FROM ktp WHERE guild_id = $1''')
+        bot.queries.register("ktp.update_msg_id", '''UPDATE ktp SET ktp_msg_id = $1 WHERE guild_id = $2 AND ktp_id = $3''')
+        bot.queries.register("ktp.create", '''
+            INSERT INTO ktp (guild_id, ktp_channel_id, ktp_msg_id, ktp_content)
+            VALUES ($1, $2, $3, $4)''')
+        bot.queries.register("ktp.get", '''SELECT * FROM ktp WHERE guild_id = $1 AND ktp_id = $2''')
+        bot.queries.register("ktp.delete", '''DELETE FROM ktp WHERE guild_id = $1 AND ktp_id = $2''')
     
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -37,19 +29,21 @@ class KeepOnTop(commands.Cog, name="Keep On Top"):
         Also update the message ID so we know which one to delete next time
         '''
         if message.guild:
+            #The connection is not held across the API calls below, so a slow channel does not starve the pool
             async with self.bot.pool.acquire() as con:
-                results = await con.fetch('''SELECT * FROM ktp WHERE guild_id = $1''', message.guild.id)
-                for result in results:
-                    if result.get('ktp_channel_id') == message.channel.id and result.get('ktp_content') != message.content and result.get('ktp_msg_id') != message.id:
-                        channel = message.channel
-                        previous_top = channel.get_partial_message(result.get('ktp_msg_id'))
-                        try:
-                            await previous_top.delete() #Necessary to put in a try/except otherwise on a spammy channel this might spam the console to hell
-                        except discord.errors.NotFound:
-                            return
-                        new_top = await channel.send(content=result.get('ktp_content'))
-                        await con.execute('''UPDATE ktp SET ktp_msg_id = $1 WHERE guild_id = $2 AND ktp_id = $3''', new_top.id, message.guild.id, result.get('ktp_id'))
-                        break
+                results = await self.bot.queries.fetch(con, "ktp.get_all", message.guild.id)
+            for result in results:
+                if result.get('ktp_channel_id') == message.channel.id and result.get('ktp_content') != message.content and result.get('ktp_msg_id') != message.id:
+                    channel = message.channel
+                    previous_top = channel.get_partial_message(result.get('ktp_msg_id'))
+                    try:
+                        await previous_top.delete() #Necessary to put in a try/except otherwise on a spammy channel this might spam the console to hell
+                    except discord.errors.NotFound:
+                        return
+                    new_top = await channel.send(content=result.get('ktp_content'))
+                    async with self.bot.pool.acquire() as con:
+                        await self.bot.queries.execute(con, "ktp.update_msg_id", new_top.id, message.guild.id, result.get('ktp_id'))
+                    break
 
 
     @commands.group(aliases=["ktp"], help="Lists all keep-on-top messages. Subcommands can add/remove them.", description="Helps you list/manage keep-on-top messages. Keep-on-top messages are messages that are always the last message in the given channel, effectively being pinned.", usage="keepontop", invoke_without_command=True, case_insensitive=True)
@@ -61,7 +55,7 @@ class KeepOnTop(commands.Cog, name="Keep On Top"):
         sent in that channel.
         '''
         async with ctx.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM ktp WHERE guild_id = $1''', ctx.guild.id)
+            results = await self.bot.queries.fetch(con, "ktp.get_all", ctx.guild.id)
             if results and len(results) != 0:
                 text = ""
                 for result in results:
@@ -77,7 +71,7 @@ class KeepOnTop(commands.Cog, name="Keep On Top"):
     async def ktp_add(self, ctx):
 
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM ktp WHERE guild_id = $1''', ctx.guild.id)
+            results = await self.bot.queries.fetch(con, "ktp.get_all", ctx.guild.id)
         
         if results and len(results) >= 1:
             embed=discord.Embed(title="❌ Error: Too many keep-on-top messages", description="A server can only have up to **1** keep-on-top message(s) at a time.", color=self.bot.errorColor)
@@ -108,10 +102,7 @@ class KeepOnTop(commands.Cog, name="Keep On Top"):
             first_top = await ktp_channel.send(ktp_content)
 
             async with self.bot.pool.acquire() as con:
-                await con.execute('''
-                INSERT INTO ktp (guild_id, ktp_channel_id, ktp_msg_id, ktp_content)
-                VALUES ($1, $2, $3, $4)
-                ''', ctx.guild.id, ktp_channel.id, first_top.id, ktp_content)
+                await self.bot.queries.execute(con, "ktp.create", ctx.guild.id, ktp_channel.id, first_top.id, ktp_content)
 
             embed=discord.Embed(title="🛠️ Keep-On-Top Setup", description=f"✅ Setup completed. This message will now be kept on top of {ktp_channel.mention}!", color=self.bot.embedGreen)
             await ctx.channel.send(embed=embed)
@@ -125,9 +116,9 @@ class KeepOnTop(commands.Cog, name="Keep On Top"):
     @commands.check(hasPriviliged)
     async def ktp_delete(self, ctx, id:int):
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM ktp WHERE guild_id = $1 AND ktp_id = $2''', ctx.guild.id, id)
+            results = await self.bot.queries.fetch(con, "ktp.get", ctx.guild.id, id)
             if results and len(results) != 0:
-                await con.execute('''DELETE FROM ktp WHERE guild_id = $1 AND ktp_id = $2''', ctx.guild.id, id)
+                await self.bot.queries.execute(con, "ktp.delete", ctx.guild.id, id)
                 embed=discord.Embed(title="✅ Keep-on-top message deleted", description="Keep-on-top message entry deleted and will no longer be kept in top!", color=self.bot.embedGreen)
                 await ctx.channel.send(embed=embed)
             else:
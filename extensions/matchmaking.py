@@ -14,12 +14,8 @@ Disclaimer: This extension is proprietary to Annoverse, and should not be used e
 '''
 #Check to see if matchmaking is set up or not
 async def is_setup(ctx):
-    async with ctx.bot.pool.acquire() as con:
-        result = await con.fetch('''SELECT * FROM matchmaking_config WHERE guild_id = $1''', ctx.guild.id)
-        if len(result) != 0 and result[0]:
-            if result[0].get('announce_channel_id'):
-                return True
-        return False
+    config = await ctx.bot.guild_configs.get(ctx.guild.id)
+    return config.matchmaking_announce_channel_id is not None
 
 def is_anno_guild(ctx):
     anno_guilds=[372128553031958529, 627876365223591976, 818223666143690783] #Guilds that are related to Anno
@@ -29,26 +25,12 @@ def is_anno_guild(ctx):
 class Matchmaking_Config():
     def __init__(self, bot):
         self.bot = bot
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.matchmaking_config
-                (
-                    guild_id bigint,
-                    init_channel_id bigint,
-                    announce_channel_id bigint,
-                    PRIMARY KEY (guild_id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(1)
     
     async def load(self, data : str, guild_id : int):
-        async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT * FROM matchmaking_config WHERE guild_id = $1''', guild_id)
-            if len(result) != 0 and result[0]:
-                return result[0].get(data)
+        #Served from the guild config cache, where matchmaking settings are prefixed with matchmaking_
+        config = await self.bot.guild_configs.get(guild_id)
+        return getattr(config, f"matchmaking_{data}", None)
     
     #This one is actually not used anywhere currently, but I thought I would include it for completeness's sake
     async def save(self, data : str, value : int, guild_id : int):
@@ -81,29 +63,17 @@ class Listing:
 class Listings():
     def __init__(self, bot):
         self.bot = bot
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.matchmaking_listings
-                (
-                    id text,
-                    ubiname text NOT NULL,
-                    host_id bigint NOT NULL,
-                    gamemode text NOT NULL,
-                    playercount text NOT NULL,
-                    DLC text NOT NULL,
-                    mods text NOT NULL,
-                    timezone text NOT NULL,
-                    additional_info text NOT NULL,
-                    timestamp bigint NOT NULL,
-                    guild_id bigint NOT NULL,
-                    PRIMARY KEY (id)
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(1)
+        bot.queries.register("matchmaking_listings.get", '''SELECT * FROM matchmaking_listings WHERE id = $1''')
+        bot.queries.register("matchmaking_listings.get_all", '''SELECT * FROM matchmaking_listings ORDER BY timestamp''')
+        bot.queries.register("matchmaking_listings.create", '''
+            INSERT INTO matchmaking_listings (id, ubiname, host_id, gamemode, playercount, DLC, mods, timezone, additional_info, timestamp, guild_id) 
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)''')
+        bot.queries.register("matchmaking_listings.delete", '''DELETE FROM matchmaking_listings WHERE id = $1''')
     
     async def retrieve(self, id):
         async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT * FROM matchmaking_listings WHERE id = $1''', id)
+            result = await self.bot.queries.fetch(con, "matchmaking_listings.get", id)
             if len(result) != 0 and result[0]:
                 listing = Listing(id=result[0].get('id'), ubiname=result[0].get('ubiname'), host_id=result[0].get('host_id'), 
                 gamemode=result[0].get('gamemode'), playercount=result[0].get('playercount'), DLC=result[0].get('DLC'), mods=result[0].get('mods'), 
@@ -114,7 +84,7 @@ class Listings():
     
     async def retrieve_all(self):
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM matchmaking_listings ORDER BY timestamp''')
+            results = await self.bot.queries.fetch(con, "matchmaking_listings.get_all")
 
             if len(results) != 0:
                 listings = []
@@ -129,17 +99,12 @@ class Listings():
     
     async def create(self, listing):
         async with self.bot.pool.acquire() as con:
-            await con.execute('''
-            INSERT INTO matchmaking_listings (id, ubiname, host_id, gamemode, playercount, DLC, mods, timezone, additional_info, timestamp, guild_id) 
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)''', 
-            listing.id, listing.ubiname, listing.host_id, listing.gamemode, listing.playercount, listing.DLC, listing.mods, listing.timezone, 
+            await self.bot.queries.execute(con, "matchmaking_listings.create", listing.id, listing.ubiname, listing.host_id, listing.gamemode, listing.playercount, listing.DLC, listing.mods, listing.timezone, 
             listing.additional_info, listing.timestamp, listing.guild_id)
     
     async def delete(self, id):
         async with self.bot.pool.acquire() as con:
-            await con.execute('''
-            DELETE FROM matchmaking_listing WHERE id = $1
-            ''', id)
+            await self.bot.queries.execute(con, "matchmaking_listings.delete", id)
 
 
 
@@ -15,19 +15,7 @@ async def hasPriviliged(ctx):
 
 class Moderation(commands.Cog):
     def __init__(self, bot):
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.mod_config
-                (
-                    guild_id bigint,
-                    mute_role_id bigint,
-                    PRIMARY KEY (guild_id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(1)
 
         self.bot = bot
         if self.bot.lang == "de":
@@ -41,6 +29,13 @@ class Moderation(commands.Cog):
             logging.error("Invalid language, fallback to English.")
             self._ = gettext.gettext
     
+    async def get_mute_role(self, guild):
+        '''
+        Returns the mute role set for the guild, None if not set
+        '''
+        config = await self.bot.guild_configs.get(guild.id)
+        return guild.get_role(config.mute_role_id)
+
     #Warn a user & print it to logs, needs logs to be set up
     @commands.command(help="Warns a user.", description="Warns the user and logs it.", usage="warn <user> [reason]")
     @commands.check(hasPriviliged)
@@ -50,11 +45,8 @@ class Moderation(commands.Cog):
         Warn a member, increasing their warning count and logging it.
         Requires userlog extension to work. Person warning must be priviliged.
         '''
-        db_user = await self.bot.global_config.get_user(offender.id, ctx.guild.id)
+        db_user = await self.bot.global_config.increment_warns(offender.id, ctx.guild.id)
         warns = db_user.warns
-        warns +=1
-        new_user = self.bot.global_config.User(user_id = db_user.user_id, guild_id = db_user.guild_id, flags=db_user.flags, warns=warns, is_muted=db_user.is_muted, notes=db_user.notes)
-        await self.bot.global_config.update_user(new_user) #Update warns for user by incrementing it
         if reason == None :
             embed=discord.Embed(title="⚠️" + self._("Warning issued"), description=self._("{offender} has been warned.").format(offender=offender.mention), color=self.bot.warnColor)
             warnembed=discord.Embed(title="⚠️ Warning issued.", description=f"{offender.mention} has been warned by {ctx.author.mention}.\n**Warns:** {warns}\n\n[Jump!]({ctx.message.jump_url})", color=self.bot.warnColor)
@@ -62,7 +54,7 @@ class Moderation(commands.Cog):
             embed=discord.Embed(title="⚠️" + self._("Warning issued"), description=self._("{offender} has been warned.\n**Reason:** {reason}").format(offender=offender.mention, reason=reason), color=self.bot.warnColor)
             warnembed=discord.Embed(title="⚠️ Warning issued.", description=f"{offender.mention} has been warned by {ctx.author.mention}.\n**Warns:** {warns}\n**Reason:** ```{reason}```\n[Jump!]({ctx.message.jump_url})", color=self.bot.warnColor)
         try:
-            await self.bot.get_cog("Logging").log_elevated(warnembed, ctx.guild.id)
+            await self.bot.get_cog("Logging").log_elevated(warnembed, ctx.guild.id, event_type="warn", user_id=offender.id, moderator_id=ctx.author.id)
             await ctx.send(embed=embed)
         except AttributeError:
             embed=discord.Embed(title="❌ " + self._("Warning failed"), description=self._("Logging is not set up properly."), color=self.bot.errorColor)
@@ -82,32 +74,28 @@ class Moderation(commands.Cog):
             embed=discord.Embed(title="❌ " + self._("You cannot mute yourself"), description=self._("You cannot mute your own account."), color=self.bot.errorColor)
             await ctx.send(embed=embed)
             return
-        db_user = await self.bot.global_config.get_user(offender.id, ctx.guild.id)
-        is_muted = db_user.is_muted
-        if is_muted == True:
+        mute_role = await self.get_mute_role(ctx.guild)
+        if mute_role is None:
+            embed=discord.Embed(title="❌ " + self._("Mute role not set"), description=self._("Unable to mute user.").format(offender=offender.mention), color=self.bot.errorColor)
+            await ctx.send(embed=embed)
+            return
+        #Returns None if the user was already muted, checking & setting the state in one go
+        db_user = await self.bot.global_config.set_muted(offender.id, ctx.guild.id, True)
+        if db_user is None:
             embed=discord.Embed(title="❌ " + self._("Already muted"), description=self._("{offender} is already muted.").format(offender=offender.mention), color=self.bot.errorColor)
             await ctx.send(embed=embed)
             return
         else:
-            mute_role_id = 0
-            async with self.bot.pool.acquire() as con:
-                result = await con.fetch('''SELECT mute_role_id FROM mod_config WHERE guild_id = $1''', ctx.guild.id)
-                if len(result) != 0 and result[0]:
-                    mute_role_id = result[0].get('mute_role_id')
-            mute_role = ctx.guild.get_role(mute_role_id)
             try:
                 await offender.add_roles(mute_role)
-            except AttributeError:
-                embed=discord.Embed(title="❌ " + self._("Mute role not set"), description=self._("Unable to mute user.").format(offender=offender.mention), color=self.bot.errorColor)
-                await ctx.send(embed=embed)
-                return
-            new_user = self.bot.global_config.User(user_id = db_user.user_id, guild_id = db_user.guild_id, flags=db_user.flags, warns=db_user.warns, is_muted=True, notes=db_user.notes)
-            await self.bot.global_config.update_user(new_user)
+            except discord.HTTPException:
+                await self.bot.global_config.set_muted(offender.id, ctx.guild.id, False)
+                raise
             embed=discord.Embed(title="🔇 " + self._("User muted"), description=self._("**{offender}** has been muted.").format(offender=offender.mention), color=self.bot.embedGreen)
             await ctx.send(embed=embed)
             muteembed=discord.Embed(title="🔇 User muted", description=F"**User:** `{offender} ({offender.id})`\n**Moderator:** `{ctx.author} ({ctx.author.id})` via {self.bot.user.mention}\n**Reason:** ```{reason}```", color=self.bot.errorColor)
             try:
-                await self.bot.get_cog("Logging").log_elevated(muteembed, ctx.guild.id)
+                await self.bot.get_cog("Logging").log_elevated(muteembed, ctx.guild.id, event_type="mute", user_id=offender.id, moderator_id=ctx.author.id)
             except AttributeError:
                 pass
     
@@ -121,12 +109,7 @@ class Moderation(commands.Cog):
         db_user = await self.bot.global_config.get_user(member.id, member.guild.id)
         if db_user.is_muted == True:
             try:
-                mute_role_id = 0
-                async with self.bot.pool.acquire() as con:
-                    result = await con.fetch('''SELECT mute_role_id FROM mod_config WHERE guild_id = $1''', member.guild.id)
-                    if len(result) != 0 and result[0]:
-                        mute_role_id = result[0].get('mute_role_id')
-                mute_role = member.guild.get_role(mute_role_id)
+                mute_role = await self.get_mute_role(member.guild)
                 await member.add_roles(mute_role)
             except AttributeError:
                 return
@@ -135,31 +118,26 @@ class Moderation(commands.Cog):
     @commands.check(hasPriviliged)
     @commands.guild_only()
     async def unmute(self, ctx, offender:discord.Member, *, reason:str=None):
-        db_user = await self.bot.global_config.get_user(offender.id, ctx.guild.id)
-        is_muted = db_user.is_muted
-        if is_muted == False:
+        mute_role = await self.get_mute_role(ctx.guild)
+        if mute_role is None:
+            embed=discord.Embed(title="❌ " + self._("Mute role not set"), description=self._("Unable to unmute user.").format(offender=offender.mention), color=self.bot.errorColor)
+            await ctx.send(embed=embed)
+            return
+        db_user = await self.bot.global_config.set_muted(offender.id, ctx.guild.id, False)
+        if db_user is None:
             embed=discord.Embed(title="❌ " + self._("Not muted"), description=self._("{offender} is not muted.").format(offender=offender.mention), color=self.bot.errorColor)
             await ctx.send(embed=embed)
             return
         else:
-            mute_role_id = 0
-            async with self.bot.pool.acquire() as con:
-                result = await con.fetch('''SELECT mute_role_id FROM mod_config WHERE guild_id = $1''', ctx.guild.id)
-                if len(result) != 0 and result[0]:
-                    mute_role_id = result[0].get('mute_role_id')
-            mute_role = ctx.guild.get_role(mute_role_id)
             try:
                 await offender.remove_roles(mute_role)
-            except AttributeError:
-                embed=discord.Embed(title="❌ " + self._("Mute role not set"), description=self._("Unable to unmute user.").format(offender=offender.mention), color=self.bot.errorColor)
-                await ctx.send(embed=embed)
-                return
-            new_user = self.bot.global_config.User(user_id = db_user.user_id, guild_id = db_user.guild_id, flags=db_user.flags, warns=db_user.warns, is_muted=False, notes=db_user.notes)
-            await self.bot.global_config.update_user(new_user)
+            except discord.HTTPException:
+                await self.bot.global_config.set_muted(offender.id, ctx.guild.id, True)
+                raise
             embed=discord.Embed(title="✅ " + self._("User unmuted"), description=self._("**{offender}** has been unmuted.").format(offender=offender.mention), color=self.bot.embedGreen)
             await ctx.send(embed=embed)
             muteembed=discord.Embed(title="🔉 User unmuted", description=F"**User:** `{offender} ({offender.id})`\n**Moderator:** `{ctx.author} ({ctx.author.id})` via {self.bot.user.mention}\n**Reason:** ```{reason}```", color=self.bot.embedGreen)
-            await self.bot.get_cog("Logging").log_elevated(muteembed, ctx.guild.id)
+            await self.bot.get_cog("Logging").log_elevated(muteembed, ctx.guild.id, event_type="unmute", user_id=offender.id, moderator_id=ctx.author.id)
     
     @commands.command(help="Temporarily mutes a user.", description="Mutes a user for a specified duration. Logs the event if logging is set up.\n\n**Time formatting:**\n`s` or `second(s)`\n`m` or `minute(s)`\n`h` or `hour(s)`\n`d` or `day(s)`\n`w` or `week(s)`\n`M` or `month(s)`\n`Y` or `year(s)`\n\n**Example:** `tempmute @User -d 5minutes -r 'Being naughty'` or `tempmute @User 5d`\n**Note:** If your arguments contain spaces, you must wrap them in quotation marks.", usage="tempmute <user> -d <duration> -r [reason] OR tempmute <user> <duration>")
     @commands.check(hasPriviliged)
@@ -187,32 +165,27 @@ class Moderation(commands.Cog):
 
             dur = await self.bot.get_cog("Timers").converttime(dur)
             dur = dur[0]
-            db_user = await self.bot.global_config.get_user(offender.id, ctx.guild.id)
-            is_muted = db_user.is_muted
-            if is_muted == True:
+            mute_role = await self.get_mute_role(ctx.guild)
+            if mute_role is None:
+                embed=discord.Embed(title="❌ " + self._("Mute role not set"), description=self._("Unable to mute user.").format(offender=offender.mention), color=self.bot.errorColor)
+                await ctx.send(embed=embed)
+                return
+            db_user = await self.bot.global_config.set_muted(offender.id, ctx.guild.id, True)
+            if db_user is None:
                 embed=discord.Embed(title="❌ " + self._("Already muted"), description=self._("{offender} is already muted.").format(offender=offender.mention), color=self.bot.errorColor)
                 await ctx.send(embed=embed)
                 return
             else:
-                await self.bot.get_cog("Timers").create_timer(expires=dur, event="tempmute", guild_id=ctx.guild.id, user_id=offender.id, channel_id=ctx.channel.id)
-                mute_role_id = 0
-                async with self.bot.pool.acquire() as con:
-                    result = await con.fetch('SELECT mute_role_id FROM mod_config WHERE guild_id = $1', ctx.guild.id)
-                    if len(result) != 0 and result[0]:
-                        mute_role_id = result[0].get('mute_role_id')
-                mute_role = ctx.guild.get_role(mute_role_id)
                 try:
                     await offender.add_roles(mute_role)
-                except AttributeError:
-                    embed=discord.Embed(title="❌ " + self._("Mute role not set"), description=self._("Unable to mute user.").format(offender=offender.mention), color=self.bot.errorColor)
-                    await ctx.send(embed=embed)
-                    return
-                new_user = self.bot.global_config.User(user_id = db_user.user_id, guild_id = db_user.guild_id, flags=db_user.flags, warns=db_user.warns, is_muted=True, notes=db_user.notes)
-                await self.bot.global_config.update_user(new_user)
+                except discord.HTTPException:
+                    await self.bot.global_config.set_muted(offender.id, ctx.guild.id, False)
+                    raise
+                await self.bot.get_cog("Timers").create_timer(expires=dur, event="tempmute", guild_id=ctx.guild.id, user_id=offender.id, channel_id=ctx.channel.id)
                 embed=discord.Embed(title="🔇 " + self._("User muted"), description=self._("**{offender}** has been muted until `{time}`.").format(offender=offender.mention, time=dur), color=self.bot.embedGreen)
                 await ctx.send(embed=embed)
                 muteembed=discord.Embed(title="🔇 User muted", description=F"**User:** `{offender} ({offender.id})`\n**Moderator:** `{ctx.author} ({ctx.author.id})` via {self.bot.user.mention}\n**Until:** `{dur} (UTC)`\n**Reason:** ```{reason}```", color=self.bot.errorColor)
-                await self.bot.get_cog("Logging").log_elevated(muteembed, ctx.guild.id)
+                await self.bot.get_cog("Logging").log_elevated(muteembed, ctx.guild.id, event_type="mute", user_id=offender.id, moderator_id=ctx.author.id)
         except ValueError:
             embed=discord.Embed(title="❌ " + self.bot.errorDataTitle, description=self._("Your entered timeformat is invalid. Type `{prefix}help tempmute` for more information.").format(prefix=ctx.prefix), color=self.bot.errorColor)
             await ctx.send(embed=embed)
@@ -227,26 +200,19 @@ class Moderation(commands.Cog):
         guild = self.bot.get_guild(timer.guild_id)
         if guild is None:
             return
-        db_user = await self.bot.global_config.get_user(timer.user_id, timer.guild_id)
-        is_muted = db_user.is_muted
-        if is_muted == False:
+        #Update this here so if the user comes back, they are not perma-muted :pepeLaugh:
+        db_user = await self.bot.global_config.set_muted(timer.user_id, timer.guild_id, False)
+        if db_user is None: #Already unmuted manually
             return
-        new_user = self.bot.global_config.User(user_id = db_user.user_id, guild_id = db_user.guild_id, flags=db_user.flags, warns=db_user.warns, is_muted=False, notes=db_user.notes)
-        await self.bot.global_config.update_user(new_user) #Update this here so if the user comes back, they are not perma-muted :pepeLaugh:
         if guild.get_member(timer.user_id) != None: #Check if the user is still in the guild
-            mute_role_id = 0
-            async with self.bot.pool.acquire() as con:
-                result = await con.fetch('SELECT mute_role_id FROM mod_config WHERE guild_id = $1', timer.guild_id)
-                if len(result) != 0 and result[0]:
-                    mute_role_id = result[0].get('mute_role_id')
-            mute_role = guild.get_role(mute_role_id)
+            mute_role = await self.get_mute_role(guild)
             try:
                 offender = guild.get_member(timer.user_id)
                 await offender.remove_roles(mute_role)
             except AttributeError:
                 return
             embed=discord.Embed(title="🔉 User unmuted.", description=f"**{offender}** `({offender.id})` has been unmuted because their temporary mute expired.".format(offender=offender.mention), color=self.bot.embedGreen)
-            await self.bot.get_cog("Logging").log_elevated(embed, timer.guild_id)
+            await self.bot.get_cog("Logging").log_elevated(embed, timer.guild_id, event_type="unmute", user_id=offender.id)
     
     @commands.command(help="Bans a user.", description="Bans a user with an optional reason. Deletes the last 7 days worth of messages from the user.", usage="ban <user> [reason]")
     @commands.check(hasPriviliged)
@@ -13,29 +13,21 @@ async def hasPriviliged(ctx):
 class ReactionRoles(commands.Cog, name="Reaction Roles"):
     def __init__(self, bot):
         self.bot = bot
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.reaction_roles
-                (
-                    guild_id bigint NOT NULL,
-                    reactionrole_id serial NOT NULL,
-                    reactionrole_channel_id bigint NOT NULL,
-                    reactionrole_msg_id bigint NOT NULL,
-                    reactionrole_emoji_id bigint NOT NULL,
-                    reactionrole_role_id bigint NOT NULL,
-                    PRIMARY KEY (guild_id, reactionrole_id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(1)
+        bot.queries.register("reaction_roles.get_all", '''SELECT * FROM reaction_roles WHERE guild_id = $1''')
+        bot.queries.register("reaction_roles.get", '''SELECT * FROM reaction_roles WHERE guild_id = $1 AND reactionrole_id = $2''')
+        bot.queries.register("reaction_roles.delete", '''DELETE FROM reaction_roles WHERE guild_id = $1 AND reactionrole_id = $2''')
+        bot.queries.register("reaction_roles.find", '''
+            SELECT * FROM reaction_roles WHERE guild_id = $1 AND reactionrole_channel_id = $2 AND reactionrole_msg_id = $3 AND reactionrole_emoji_id = $4''')
+        bot.queries.register("reaction_roles.create", '''
+            INSERT INTO reaction_roles (guild_id, reactionrole_channel_id, reactionrole_msg_id, reactionrole_emoji_id, reactionrole_role_id)
+            VALUES ($1, $2, $3, $4, $5)''')
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
         if payload.guild_id:
             async with self.bot.pool.acquire() as con:
-                results = await con.fetch('''SELECT * FROM reaction_roles WHERE guild_id = $1''', payload.guild_id)
+                results = await self.bot.queries.fetch(con, "reaction_roles.get_all", payload.guild_id)
                 for result in results:
                     if result.get('reactionrole_msg_id') == payload.message_id and result.get('reactionrole_channel_id') == payload.channel_id and result.get('reactionrole_emoji_id') == payload.emoji.id:
                         guild = self.bot.get_guild(result.get('guild_id'))
@@ -48,7 +40,7 @@ class ReactionRoles(commands.Cog, name="Reaction Roles"):
     async def on_raw_reaction_remove(self, payload):
         if payload.guild_id:
             async with self.bot.pool.acquire() as con:
-                results = await con.fetch('''SELECT * FROM reaction_roles WHERE guild_id = $1''', payload.guild_id)
+                results = await self.bot.queries.fetch(con, "reaction_roles.get_all", payload.guild_id)
                 for result in results:
                     if result.get('reactionrole_msg_id') == payload.message_id and result.get('reactionrole_channel_id') == payload.channel_id and result.get('reactionrole_emoji_id') == payload.emoji.id:
                         guild = self.bot.get_guild(result.get('guild_id'))
@@ -64,7 +56,7 @@ class ReactionRoles(commands.Cog, name="Reaction Roles"):
     @commands.check(hasPriviliged)
     async def reactionrole(self, ctx):
         async with ctx.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM reaction_roles WHERE guild_id = $1''', ctx.guild.id)
+            results = await self.bot.queries.fetch(con, "reaction_roles.get_all", ctx.guild.id)
             if results and len(results) != 0:
                 text = ""
                 for result in results:
@@ -81,7 +73,7 @@ class ReactionRoles(commands.Cog, name="Reaction Roles"):
     @commands.check(hasPriviliged)
     async def rr_delete(self, ctx, id:int):
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM reaction_roles WHERE guild_id = $1 AND reactionrole_id = $2''', ctx.guild.id, id)
+            results = await self.bot.queries.fetch(con, "reaction_roles.get", ctx.guild.id, id)
             if results and len(results) != 0:
                 reactchannel = ctx.guild.get_channel(results[0].get('reactionrole_channel_id'))
                 reactmsg = await reactchannel.fetch_message(results[0].get('reactionrole_msg_id'))
@@ -89,7 +81,7 @@ class ReactionRoles(commands.Cog, name="Reaction Roles"):
                     await reactmsg.remove_reaction(self.bot.get_emoji(results[0].get('reactionrole_emoji_id')), ctx.guild.me)
                 except discord.NotFound:
                     pass
-                await con.execute('''DELETE FROM reaction_roles WHERE guild_id = $1 AND reactionrole_id = $2''', ctx.guild.id, id)
+                await self.bot.queries.execute(con, "reaction_roles.delete", ctx.guild.id, id)
                 embed=discord.Embed(title="✅ Reaction Role deleted", description="Reaction role has been successfully deleted!", color=self.bot.embedGreen)
                 await ctx.channel.send(embed=embed)
             else:
@@ -107,7 +99,7 @@ class ReactionRoles(commands.Cog, name="Reaction Roles"):
         This is not exposed as a command directly, instead it is invoked in setup
         '''
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM reaction_roles WHERE guild_id = $1''', ctx.guild.id)
+            results = await self.bot.queries.fetch(con, "reaction_roles.get_all", ctx.guild.id)
         
         if results and len(results) >= 10:
             embed=discord.Embed(title="❌ Error: Too many reaction roles", description="A server can only have up to **10** reaction roles at a time.", color=self.bot.errorColor)
@@ -223,25 +215,20 @@ class ReactionRoles(commands.Cog, name="Reaction Roles"):
             return
 
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''
-            SELECT * FROM reaction_roles WHERE guild_id = $1 AND reactionrole_channel_id = $2 AND reactionrole_msg_id = $3 AND reactionrole_emoji_id = $4
-            ''', ctx.guild.id, reactchannel.id, reactmsg.id, reactemoji.id)
+            results = await self.bot.queries.fetch(con, "reaction_roles.find", ctx.guild.id, reactchannel.id, reactmsg.id, reactemoji.id)
             if results and len(results) != 0:
                 embed=discord.Embed(title="❌ Error: Duplicate", description=f"This role reaction already exists. Please remove it first via `{ctx.prefix}rolereaction delete <ID>`", color=self.bot.errorColor)
                 await ctx.channel.send(embed=embed)
                 return
 
-            await con.execute('''
-            INSERT INTO reaction_roles (guild_id, reactionrole_channel_id, reactionrole_msg_id, reactionrole_emoji_id, reactionrole_role_id)
-            VALUES ($1, $2, $3, $4, $5)
-            ''', ctx.guild.id, reactchannel.id, reactmsg.id, reactemoji.id, reactionrole.id)
+            await self.bot.queries.execute(con, "reaction_roles.create", ctx.guild.id, reactchannel.id, reactmsg.id, reactemoji.id, reactionrole.id)
 
         embed=discord.Embed(title="🛠️ Reaction Roles setup", description="✅ Setup completed. Reaction role set up!", color=self.bot.embedGreen)
         await ctx.channel.send(embed=embed)
 
         embed=discord.Embed(title="❇️ Reaction Role added", description=f"A reaction role for role {reactionrole.mention} has been created by {ctx.author.mention} in channel {reactchannel.mention}.\n__Note:__ Anyone who can see this channel can now obtain this role!", color=self.bot.embedGreen)
         try:
-            await self.bot.get_cog('Logging').log_elevated(embed, ctx.guild.id)
+            await self.bot.get_cog('Logging').log_elevated(embed, ctx.guild.id, event_type="reaction_role", moderator_id=ctx.author.id)
         except AttributeError:
             pass
         
@@ -16,6 +16,18 @@ async def hasPriviliged(ctx):
 class Setup(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        bot.queries.register("setup.matchmaking", '''
+            INSERT INTO matchmaking_config (guild_id, init_channel_id, announce_channel_id) VALUES ($1, $2, $3)
+            ON CONFLICT (guild_id) DO
+            UPDATE SET init_channel_id = $2, announce_channel_id = $3''')
+        bot.queries.register("setup.logging", '''
+            INSERT INTO log_config (guild_id, log_channel_id, elevated_log_channel_id, log_events) VALUES ($1, $2, $3, $4)
+            ON CONFLICT (guild_id) DO
+            UPDATE SET log_channel_id  = $2, elevated_log_channel_id = $3, log_events = $4''')
+        bot.queries.register("setup.moderation", '''
+            INSERT INTO mod_config (guild_id, mute_role_id) VALUES ($1, $2)
+            ON CONFLICT (guild_id) DO
+            UPDATE SET mute_role_id  = $2''')
 
     #Ahh yes, the setup command... *instant PTSD*
     #It basically just collects a bunch of values from the user, in this case an admin, and then changes the settings
@@ -68,10 +80,8 @@ class Setup(commands.Cog):
             #Executing based on info
 
             async with self.bot.pool.acquire() as con:
-                await con.execute('''
-                INSERT INTO matchmaking_config (guild_id, init_channel_id, announce_channel_id) VALUES ($1, $2, $3)
-                ON CONFLICT (guild_id) DO
-                UPDATE SET init_channel_id = $2, announce_channel_id = $3''', ctx.guild.id, cmdchannel_id, announcechannel.id)
+                await self.bot.queries.execute(con, "setup.matchmaking", ctx.guild.id, cmdchannel_id, announcechannel.id)
+            self.bot.guild_configs.invalidate(ctx.guild.id)
 
             embed=discord.Embed(title="🛠️ Matchmaking setup", description="✅ Setup completed. Matchmaking set up!", color=self.bot.embedGreen)
             await ctx.channel.send(embed=embed)
@@ -133,12 +143,29 @@ class Setup(commands.Cog):
                 elevated_loggingChannelID = None
                 embed=discord.Embed(title="🛠️ Logging Setup", description=f"No elevated logging channel set.", color=self.bot.embedBlue)
                 await ctx.send(embed=embed)
+
+            event_types = self.bot.get_cog("Logging").event_types
+            embed=discord.Embed(title="🛠️ Logging Setup", description=f"Finally, you can *optionally* choose which events should be logged, separated by spaces, e.g. `ban kick warn`. Type `all` to log everything.\n\n**Events:** {', '.join(f'`{event_type}`' for event_type in event_types)}", color=self.bot.embedBlue)
+            await ctx.channel.send(embed=embed)
+            payload = await self.bot.wait_for('message', timeout=60.0, check=check)
+            if payload.content.lower() == "all":
+                log_events = -1
+                embed=discord.Embed(title="🛠️ Logging Setup", description=f"All events will be logged.", color=self.bot.embedBlue)
+                await ctx.send(embed=embed)
+            else:
+                selected = payload.content.lower().replace(",", " ").split()
+                invalid = [event_type for event_type in selected if event_type not in event_types]
+                if invalid or not selected:
+                    embed=discord.Embed(title=self.bot.errorDataTitle, description=f"Unknown event type(s): `{', '.join(invalid)}`\nThe setup process has been cancelled.", color=self.bot.errorColor)
+                    await ctx.channel.send(embed=embed)
+                    return
+                log_events = self.bot.get_cog("Logging").event_mask(selected)
+                embed=discord.Embed(title="🛠️ Logging Setup", description=f"Only these events will be logged: {', '.join(f'`{event_type}`' for event_type in selected)}", color=self.bot.embedBlue)
+                await ctx.send(embed=embed)
             
             async with self.bot.pool.acquire() as con:
-                await con.execute('''
-            INSERT INTO log_config (guild_id, log_channel_id, elevated_log_channel_id) VALUES ($1, $2, $3)
-            ON CONFLICT (guild_id) DO
-            UPDATE SET log_channel_id  = $2, elevated_log_channel_id = $3''', ctx.guild.id, loggingChannel.id, elevated_loggingChannelID)
+                await self.bot.queries.execute(con, "setup.logging", ctx.guild.id, loggingChannel.id, elevated_loggingChannelID, log_events)
+            self.bot.guild_configs.invalidate(ctx.guild.id)
 
             embed=discord.Embed(title="🛠️ Logging Setup", description=f"✅ Setup completed. Logs will now be recorded!", color=self.bot.embedGreen)
             await ctx.channel.send(embed=embed)
@@ -174,10 +201,8 @@ class Setup(commands.Cog):
             try:
                 muterole = await commands.RoleConverter().convert(ctx, message.content)
                 async with self.bot.pool.acquire() as con:
-                    await con.execute('''
-                    INSERT INTO mod_config (guild_id, mute_role_id) VALUES ($1, $2)
-                    ON CONFLICT (guild_id) DO
-                    UPDATE SET mute_role_id  = $2''', ctx.guild.id, muterole.id)
+                    await self.bot.queries.execute(con, "setup.moderation", ctx.guild.id, muterole.id)
+                self.bot.guild_configs.invalidate(ctx.guild.id)
             except commands.RoleNotFound:
                 embed=discord.Embed(title="❌ Error: Unable to locate role.", description="The setup process has been cancelled.", color=self.bot.errorColor)
                 await ctx.channel.send(embed=embed)
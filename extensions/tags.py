@@ -28,22 +28,14 @@ class TagHandler():
     '''
     def __init__(self, bot):
         self.bot = bot
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.tags
-                (
-                    guild_id bigint NOT NULL,
-                    tag_name text NOT NULL,
-                    tag_owner_id bigint NOT NULL,
-                    tag_aliases text[],
-                    tag_content text NOT NULL,
-                    PRIMARY KEY (guild_id, tag_name),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(2)
+        bot.queries.register("tags.get", '''SELECT * FROM tags WHERE tag_name = $1 AND guild_id = $2''')
+        bot.queries.register("tags.get_by_alias", '''SELECT * FROM tags WHERE tag_aliases @> ARRAY[$1::text] AND guild_id = $2''')
+        bot.queries.register("tags.get_all", '''SELECT * FROM tags WHERE guild_id = $1''')
+        bot.queries.register("tags.create", '''
+            INSERT INTO tags (guild_id, tag_name, tag_owner_id, tag_aliases, tag_content)
+            VALUES ($1, $2, $3, $4, $5)''')
+        bot.queries.register("tags.delete", '''DELETE FROM tags WHERE tag_name = $1 AND guild_id = $2''')
     
     async def get(self, tag_name : str, guild_id : int):
         '''
@@ -51,12 +43,12 @@ class TagHandler():
         Will try to find aliases too.
         '''
         async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT * FROM tags WHERE tag_name = $1 AND guild_id = $2''', tag_name.lower(), guild_id)
+            result = await self.bot.queries.fetch(con, "tags.get", tag_name.lower(), guild_id)
             if len(result) != 0:
                 tag = Tag(guild_id=result[0].get('guild_id'), tag_name=result[0].get('tag_name'), tag_owner_id=result[0].get('tag_owner_id'), 
                 tag_aliases=result[0].get('tag_aliases'), tag_content=result[0].get('tag_content'))
                 return tag
-            result = await con.fetch('''SELECT * FROM tags WHERE $1 = ANY(tag_aliases) AND guild_id = $2''', tag_name.lower(), guild_id)
+            result = await self.bot.queries.fetch(con, "tags.get_by_alias", tag_name.lower(), guild_id)
             if len(result) !=0:
                 tag = Tag(guild_id=result[0].get('guild_id'), tag_name=result[0].get('tag_name'), tag_owner_id=result[0].get('tag_owner_id'), 
                 tag_aliases=result[0].get('tag_aliases'), tag_content=result[0].get('tag_content'))
@@ -67,16 +59,14 @@ class TagHandler():
         Creates a new tag based on an instance of a Tag.
         '''
         async with self.bot.pool.acquire() as con:
-            await con.execute('''
-            INSERT INTO tags (guild_id, tag_name, tag_owner_id, tag_aliases, tag_content)
-            VALUES ($1, $2, $3, $4, $5)''', tag.guild_id, tag.tag_name, tag.tag_owner_id, tag.tag_aliases, tag.tag_content)
+            await self.bot.queries.execute(con, "tags.create", tag.guild_id, tag.tag_name, tag.tag_owner_id, tag.tag_aliases, tag.tag_content)
     
     async def get_all(self, guild_id : int):
         '''
         Returns a list of all tags for the specified guild.
         '''
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM tags WHERE guild_id = $1''', guild_id)
+            results = await self.bot.queries.fetch(con, "tags.get_all", guild_id)
             if len(results) != 0:
                 tags = []
                 for result in results:
@@ -87,7 +77,7 @@ class TagHandler():
     
     async def delete(self, tag_name : str, guild_id : int):
         async with self.bot.pool.acquire() as con:
-            await con.execute('''DELETE FROM tags WHERE tag_name = $1 AND guild_id = $2''', tag_name, guild_id)
+            await self.bot.queries.execute(con, "tags.delete", tag_name, guild_id)
     
 
 
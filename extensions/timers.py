@@ -1,8 +1,15 @@
 import asyncio
 import datetime
 import gettext
+import heapq
+import json
 import logging
+import os
 import re
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 
 import asyncpg
 import discord
@@ -16,6 +23,9 @@ Also thanks to Vex#3110 from the discord.py discord for the original regex code,
 I tweaked to to be a bit more generally applicable (and possibly more shit) :verycool:
 '''
 
+#Errors a query can fail with while the bot is running normally, e.g. a dropped connection or a query that timed out
+database_errors = (OSError, asyncpg.PostgresError, asyncpg.InterfaceError, asyncio.TimeoutError)
+
 async def hasOwner(ctx):
     return await ctx.bot.CommandChecks.hasOwner(ctx)
 async def hasPriviliged(ctx):
@@ -31,30 +41,172 @@ class Timer():
         self.expires = expires
         self.notes = notes
 
+    @classmethod
+    def from_record(cls, record):
+        return cls(id=record.get('id'),guild_id=record.get('guild_id'),user_id=record.get('user_id'),channel_id=record.get('channel_id'),event=record.get('event'),expires=record.get('expires'),notes=record.get('notes'))
+
+class RateLimiter():
+    '''
+    Spaces out callers of wait() so at most rate of them continue per second, a rate of 0 disables the limit
+    '''
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.next_slot = 0.0
+
+    async def wait(self):
+        if not self.rate:
+            return
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        self.next_slot = max(self.next_slot, now)
+        delay = self.next_slot - now
+        self.next_slot += 1 / self.rate
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+@dataclass
+class CatchUpProgress:
+    '''
+    Represents the progress of dispatching a backlog of overdue timers, times are in seconds of the event loop clock
+    '''
+    started_at:float
+    finished_at:float=None
+    claimed:int=0
+    dispatched:int=0
+    unclaimed:int=0 #Overdue timers not claimed by any process yet, as of the last claim
+
+    @property
+    def remaining(self):
+        return self.unclaimed + self.claimed - self.dispatched
+
+    def rate(self, now):
+        elapsed = (self.finished_at or now) - self.started_at
+        return self.dispatched / elapsed if elapsed > 0 else 0.0
+
+    def eta(self, now):
+        rate = self.rate(now)
+        return self.remaining / rate if rate else None
+
+class TimerScheduler():
+    '''
+    Keeps every timer that expires before loaded_until in a min-heap ordered by expiry, timers are loaded from the database
+    in one batch per horizon, and the horizon is moved forward in the background
+    Cancelled & rescheduled timers are only removed from the heap once they reach the top
+    '''
+
+    horizon = 3600 #Seconds of timers to load ahead
+
+    def __init__(self):
+        self.heap = [] #In the format of (expires, id)
+        self.timers = {} #In the format of id:Timer, every timer in the heap that was not cancelled
+        self.loaded_until = 0 #Timers expiring before this are in the heap, as seconds since epoch
+        self.wakeup = asyncio.Event() #Set when a timer became the head of the heap
+
+    def push(self, timer):
+        '''
+        Adds a timer to the heap if it falls within the loaded horizon, otherwise it is loaded with a later refill
+        Pushing a timer that is already scheduled with a different expiry reschedules it
+        '''
+        scheduled = self.timers.get(timer.id)
+        if scheduled and scheduled.expires == timer.expires:
+            return
+        if timer.expires >= self.loaded_until:
+            self.cancel(timer.id)
+            return
+        self.timers[timer.id] = timer
+        heapq.heappush(self.heap, (timer.expires, timer.id))
+        if self.heap[0][1] == timer.id:
+            self.wakeup.set()
+
+    def _is_live(self, entry):
+        expires, timer_id = entry
+        timer = self.timers.get(timer_id)
+        return timer is not None and timer.expires == expires
+
+    def cancel(self, timer_id):
+        if self.timers.pop(timer_id, None) and len(self.heap) > 2 * len(self.timers) + 64:
+            #Drop cancelled entries once they make up most of the heap
+            self.heap = [entry for entry in self.heap if self._is_live(entry)]
+            heapq.heapify(self.heap)
+
+    def peek(self):
+        '''
+        Returns the timer that expires next, None if there are no timers within the horizon
+        '''
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+        if self.heap:
+            return self.timers[self.heap[0][1]]
+
+    def pop(self):
+        timer = self.peek()
+        if timer:
+            heapq.heappop(self.heap)
+            del self.timers[timer.id]
+        return timer
+
+    async def refill(self, bot):
+        '''
+        Moves the horizon forward, loading the timers between the old & new horizon in one query
+        '''
+        start = self.loaded_until
+        #Timers created while the query runs already fall within the new horizon, so they are pushed by create_timer
+        self.loaded_until = round(datetime.datetime.utcnow().timestamp()) + self.horizon
+        try:
+            async with bot.pool.acquire() as con:
+                results = await bot.queries.fetch(con, "timers.get_range", start, self.loaded_until)
+        except Exception:
+            self.loaded_until = start
+            raise
+        for result in results:
+            self.push(Timer.from_record(result))
+        logging.debug(f"Loaded {len(results)} timers, {len(self.timers)} timers scheduled.")
+
+    async def reload(self, bot):
+        '''
+        Loads every timer up to the horizon again, used when changes to the timers table may have been missed
+        '''
+        self.loaded_until = 0
+        await self.refill(bot)
+
 class Timers(commands.Cog):
 
+    #Maximum amount of timer listeners running at the same time, when many timers expire together
+    dispatch_concurrency = 50
+    #Timers claimed at once, & how long a claim is held for, in seconds. A claim that was not completed in time,
+    #e.g. because the process crashed, runs out and the timers are claimed again by any process
+    claim_limit = 1000
+    lease_seconds = 300
+    #Timers that are overdue by more than this many seconds, e.g. after downtime, are dispatched by the catch-up workers,
+    #with the concurrency & rate limit set via TIMER_CATCHUP_CONCURRENCY and TIMER_CATCHUP_RATE, so fresh timers never wait behind them
+    catchup_threshold = 60
+
     def __init__(self, bot):
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.timers
-                (
-                    id serial NOT NULL,
-                    guild_id bigint NOT NULL,
-                    user_id bigint NOT NULL,
-                    channel_id bigint,
-                    event text NOT NULL,
-                    expires bigint NOT NULL,
-                    notes text,
-                    PRIMARY KEY (id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(6)
         self.bot = bot
-        self.current_timer = None
+        #Identifies the timers claimed by this process, if multiple processes share the database
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        bot.queries.register("timers.get_range", '''SELECT * FROM timers WHERE expires >= $1 AND expires < $2 ORDER BY expires''')
+        bot.queries.register("timers.create", '''INSERT INTO timers (guild_id, channel_id, user_id, event, expires, notes) VALUES ($1, $2, $3, $4, $5, $6) RETURNING id''')
+        #Rows locked by another process claiming at the same time are skipped, so no timer is claimed twice
+        bot.queries.register("timers.claim_due", '''
+        UPDATE timers SET claimed_by = $4, claimed_until = $5 WHERE id IN (
+            SELECT id FROM timers WHERE expires > $1 AND expires <= $2 AND (claimed_until IS NULL OR claimed_until < $3)
+            ORDER BY expires LIMIT $6 FOR UPDATE SKIP LOCKED
+        ) RETURNING *''')
+        bot.queries.register("timers.count_unclaimed", '''SELECT count(*) FROM timers WHERE expires <= $1 AND (claimed_until IS NULL OR claimed_until < $2)''')
+        bot.queries.register("timers.complete", '''DELETE FROM timers WHERE id = ANY($1::int[]) AND claimed_by = $2''')
+        bot.queries.register("timers.get_by_user", '''SELECT * FROM timers WHERE guild_id = $1 AND user_id = $2 ORDER BY expires LIMIT 10''')
+        bot.queries.register("timers.delete_by_user", '''DELETE FROM timers WHERE user_id = $1 AND id = $2''')
+        bot.queries.register("timers.renew", '''UPDATE timers SET claimed_until = $3 WHERE id = ANY($1::int[]) AND claimed_by = $2''')
+        self.scheduler = TimerScheduler()
         self.currenttask = None
+        self.restart_handle = None
+        self.catchuptask = None
+        self.catchup = None #The CatchUpProgress of the current or last catch-up
+        #Changes to the timers table are announced by a trigger, see migrations/0006_timer_notify.sql
+        self.listentask = self.bot.loop.create_task(self.listen_timers())
         if self.bot.lang == "de":
             de = gettext.translation('timers', localedir=self.bot.localePath, languages=['de'])
             de.install()
@@ -65,13 +217,21 @@ class Timers(commands.Cog):
         else :
             logging.error("Invalid language, fallback to English.")
             self._ = gettext.gettext
-        self.wait_for_active_timers.start()
+        self.refill_timers.start()
+        self.reclaim_timers.start()
 
 
 
     def cog_unload(self):
-        self.currenttask.cancel()
-        self.wait_for_active_timers.cancel()
+        if self.currenttask:
+            self.currenttask.cancel()
+        if self.restart_handle:
+            self.restart_handle.cancel()
+        self.listentask.cancel()
+        if self.catchuptask:
+            self.catchuptask.cancel()
+        self.refill_timers.cancel()
+        self.reclaim_timers.cancel()
     
     #Tries converting a string to datetime.datetime via regex, returns datetime.datetime and strings it extracted from if successful, otherwise raises ValueError
     #Result of 12 hours of pain #remember
@@ -156,92 +316,286 @@ class Timers(commands.Cog):
         timestr = timestr.capitalize()
         return time, timestr
 
-    #Gets the timer the first timer that is about to expire in X days, and returns it. Return None if no timers are found in that scope.
-    async def get_latest_timer(self, days=7):
-        await self.bot.wait_until_ready() #This must be included or you get a lot of NoneType errors while booting up, and timers do not get delivered
-        logging.debug("Getting latest timer...")
+    #Claims up to limit timers that expired after after & by until (seconds since epoch) & are not claimed by another process, and returns them
+    async def claim_timers(self, after : int, until : int, limit : int):
+        now = round(datetime.datetime.utcnow().timestamp())
         async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT * FROM timers WHERE expires < $1 ORDER BY expires LIMIT 1''', round((datetime.datetime.utcnow() + datetime.timedelta(days=days)).timestamp()))
-            logging.debug(f"Latest timer from db: {result}")
-            if len(result) != 0 and result[0]:
-                timer = Timer(id=result[0].get('id'),guild_id=result[0].get('guild_id'),user_id=result[0].get('user_id'),channel_id=result[0].get('channel_id'),event=result[0].get('event'),expires=result[0].get('expires'),notes=result[0].get('notes'))
-                #self.current_timer = timer
-                logging.debug(f"Timer class created for latest: {timer}")
-                return timer
-    
+            results = await self.bot.queries.fetch(con, "timers.claim_due", after, until, now, self.instance_id, now + self.lease_seconds, limit)
+        timers = [Timer.from_record(result) for result in results]
+        for timer in timers:
+            self.scheduler.cancel(timer.id)
+        return timers
 
-    #The actual calling of the timer, deletes it from the db & dispatches the event
-    async def call_timer(self, timer : Timer):
-        logging.debug("Deleting timer entry {timerid}".format(timerid=timer.id))
+    #Deletes timers claimed by this process after they were dispatched
+    async def complete_timers(self, timers : list):
         async with self.bot.pool.acquire() as con:
-            await con.execute('''DELETE FROM timers WHERE id = $1''', timer.id)
-            await self.db.commit()
-            #Set the currently evaluated timer to None
-            self.current_timer = None
-            logging.debug("Deleted")
-            '''
-            Dispatch an event named eventname_timer_complete, which will cause all listeners 
-            for this event to fire. This function is not documented, so if anything breaks, it
-            is probably in here. It passes on the timer's dict.
-            '''
-            logging.debug("Dispatching..")
-            event = timer.event
-            event_name = f'{event}_timer_complete'
-            logging.debug(event_name)
-            self.bot.dispatch(event_name, timer)
-            logging.debug("Dispatched.")
+            await self.bot.queries.execute(con, "timers.complete", [timer.id for timer in timers], self.instance_id)
 
-    async def dispatch_timers(self):
-        logging.debug("Dispatching timers.")
+    @asynccontextmanager
+    async def keep_claimed(self, timers : list):
+        '''
+        Renews the lease of timers claimed by this process every third of lease_seconds while the code inside runs,
+        so timers whose listeners take longer than a lease, e.g. because of rate limits, are never claimed again while being dispatched
+        '''
+        async def renew():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                now = round(datetime.datetime.utcnow().timestamp())
+                try:
+                    async with self.bot.pool.acquire() as con:
+                        await self.bot.queries.execute(con, "timers.renew", [timer.id for timer in timers], self.instance_id, now + self.lease_seconds)
+                except database_errors as error:
+                    logging.error(f"Failed renewing the claim of {len(timers)} timers: {error}")
+
+        task = self.bot.loop.create_task(renew())
+        try:
+            yield
+        finally:
+            task.cancel()
+
+    async def dispatch_due(self, after : int = None):
+        '''
+        Claims, dispatches & completes every due timer that expired after after, by default catchup_threshold seconds ago,
+        claim_limit timers at a time, returns how many timers were dispatched
+        If the process dies while dispatching, the claimed timers are dispatched again once their lease runs out
+        '''
+        dispatched = 0
+        while True:
+            now = round(datetime.datetime.utcnow().timestamp())
+            timers = await self.claim_timers(after if after is not None else now - self.catchup_threshold, now, self.claim_limit)
+            if timers:
+                async with self.keep_claimed(timers):
+                    await self.dispatch_batch(timers)
+                await self.complete_timers(timers)
+                dispatched += len(timers)
+            if len(timers) < self.claim_limit:
+                return dispatched
+
+    async def dispatch_batch(self, timers : list):
+        '''
+        Runs the listeners of an event named eventname_timer_complete for every timer, grouped by event,
+        with at most dispatch_concurrency listeners running at once. Returns when all of them finished.
+        Listeners are run the same way bot.dispatch() runs them, but are awaited so a big batch cannot flood the event loop
+        '''
+        groups = {}
+        for timer in timers:
+            groups.setdefault(timer.event, []).append(timer)
+        semaphore = asyncio.Semaphore(self.dispatch_concurrency)
+
+        async def run_listeners(timer):
+            async with semaphore:
+                await self.run_timer_listeners(timer)
+
+        for event, group in groups.items():
+            logging.info(f"Dispatching {len(group)} timers: {event}")
+        await asyncio.gather(*[run_listeners(timer) for timer in timers])
+
+    async def run_timer_listeners(self, timer : Timer):
+        event_name = f'{timer.event}_timer_complete'
+        for listener in list(self.bot.extra_events.get(f'on_{event_name}', [])):
+            await self.bot._run_event(listener, event_name, timer)
+
+    def start_catch_up(self):
+        if self.catchuptask is None or self.catchuptask.done():
+            self.catchuptask = self.bot.loop.create_task(self.catch_up())
+
+    async def catch_up(self):
+        '''
+        Dispatches every timer overdue by more than catchup_threshold, with a pool of workers, each waiting for the rate limiter
+        before running the listeners of a timer, so a backlog after downtime cannot trip Discord's rate limits
+        Timers are claimed in chunks small enough to be dispatched well within their lease at the configured rate
+        '''
+        concurrency = max(1, self.bot.timer_catchup_concurrency)
+        limiter = RateLimiter(self.bot.timer_catchup_rate)
+        chunk_size = self.claim_limit
+        if limiter.rate:
+            chunk_size = max(1, min(chunk_size, int(limiter.rate * self.lease_seconds / 2)))
+        progress = CatchUpProgress(started_at=self.bot.loop.time())
+        queue = asyncio.Queue()
+
+        async def worker():
+            while True:
+                timer = await queue.get()
+                try:
+                    await limiter.wait()
+                    await self.run_timer_listeners(timer)
+                    progress.dispatched += 1
+                finally:
+                    queue.task_done()
+
+        workers = []
         try:
-            while not self.bot.is_closed():
-                logging.debug("Getting timer")
-                timer = await self.get_latest_timer(days=40)
-                self.current_timer=timer
+            while True:
                 now = round(datetime.datetime.utcnow().timestamp())
-                logging.debug(f"Now: {now}")
-                logging.debug(f"Timer: {timer}")
-                logging.debug("Has timer")
-                if timer:
-                    logging.debug("Evaluating timer.")
-                    if timer.expires >= now:
-                        sleep_time = (timer.expires - now)
-                        logging.info(f"Awaiting next timer: '{timer.event}', which is in {sleep_time}s")
-                        await asyncio.sleep(sleep_time)
-
-                    logging.info(f"Dispatching timer: {timer.event}")
-                    await self.call_timer(timer)
-                else:
-                    break #This is necessary because if on start-up there is no stored timer, it will go into an infinite loop
-        
-        except asyncio.CancelledError:
-            raise
-        except(OSError, discord.ConnectionClosed):
-            self.currenttask.cancel()
+                timers = await self.claim_timers(0, now - self.catchup_threshold, chunk_size)
+                if not timers:
+                    break
+                async with self.bot.pool.acquire() as con:
+                    progress.unclaimed = await self.bot.queries.fetchval(con, "timers.count_unclaimed", now - self.catchup_threshold, now)
+                progress.claimed += len(timers)
+                if self.catchup is not progress:
+                    self.catchup = progress
+                    logging.warning(f"Catching up on {progress.remaining} overdue timers with {concurrency} workers.")
+                    workers = [self.bot.loop.create_task(worker()) for i in range(concurrency)]
+                for timer in timers:
+                    queue.put_nowait(timer)
+                async with self.keep_claimed(timers):
+                    await queue.join()
+                await self.complete_timers(timers)
+                eta = progress.eta(self.bot.loop.time())
+                logging.info(f"Timer catch-up: {progress.dispatched} dispatched, {progress.remaining} remaining, {round(progress.rate(self.bot.loop.time()), 2)}/s, ETA {round(eta) if eta is not None else '-'}s")
+        except database_errors as error:
+            logging.error(f"Failed catching up on overdue timers: {error}")
+        finally:
+            for task in workers:
+                task.cancel()
+            if self.catchup is progress:
+                progress.finished_at = self.bot.loop.time()
+                logging.warning(f"Timer catch-up finished, dispatched {progress.dispatched} overdue timers in {round(progress.finished_at - progress.started_at, 2)}s.")
+
+    def start_dispatcher(self):
+        if self.currenttask is None or self.currenttask.done():
             self.currenttask = self.bot.loop.create_task(self.dispatch_timers())
+            self.currenttask.add_done_callback(self._on_dispatcher_done)
+
+    def _on_dispatcher_done(self, task):
+        #Restart the dispatcher if it died from an unexpected error, so timers keep being delivered
+        if task.cancelled() or self.bot.is_closed():
+            return
+        if task.exception():
+            logging.error("Timer dispatcher failed, restarting in 5s.", exc_info=task.exception())
+        self.restart_handle = self.bot.loop.call_later(5, self.start_dispatcher)
+
+    #Sleeps until the head of the scheduler expires, new heads wake it up early, so it never has to be restarted
+    async def dispatch_timers(self):
+        logging.debug("Dispatching timers.")
+        await self.bot.wait_until_ready() #This must be included or you get a lot of NoneType errors while booting up, and timers do not get delivered
+        while not self.bot.is_closed():
+            #Clear before looking at the head, so a timer pushed after this is never missed
+            self.scheduler.wakeup.clear()
+            timer = self.scheduler.peek()
+            if timer is None:
+                await self.scheduler.wakeup.wait()
+                continue
+            now = datetime.datetime.utcnow().timestamp()
+            sleep_time = timer.expires - now
+            if sleep_time > 0:
+                logging.debug(f"Awaiting next timer: '{timer.event}', which is in {round(sleep_time)}s")
+                try:
+                    await asyncio.wait_for(self.scheduler.wakeup.wait(), timeout=sleep_time)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            #Timers overdue for a while are left to the catch-up workers, so a backlog does not delay fresh timers
+            after = int(now) - self.catchup_threshold
+            if timer.expires <= after:
+                self.start_catch_up()
+            #Claim every timer that is due, not just the head, so timers expiring together are handled in one go
+            try:
+                await self.dispatch_due(after)
+            except database_errors as error:
+                logging.error(f"Failed claiming due timers, retrying: {error}")
+                await asyncio.sleep(5)
+                continue
+            #Due timers still scheduled were deleted, claimed by another process, or are left to the catch-up workers
+            while timer and timer.expires <= now:
+                self.scheduler.pop()
+                timer = self.scheduler.peek()
 
     async def create_timer(self, expires : datetime.datetime, event :str, guild_id : int, user_id:int, channel_id:int=None, *, notes:str=None):
         logging.debug(f"Expiry: {expires}")
         expires=round(expires.timestamp()) #Converting it to time since epoch
         async with self.bot.pool.acquire() as con:
-            await con.execute('''INSERT INTO timers (guild_id, channel_id, user_id, event, expires, notes) VALUES ($1, $2, $3, $4, $5, $6)''', guild_id, channel_id, user_id, event, expires, notes)
+            timer_id = await self.bot.queries.fetchval(con, "timers.create", guild_id, channel_id, user_id, event, expires, notes)
         logging.debug("Saved to database.")
-        #If there is already a timer in queue, and it has an expiry that is further than the timer we just created
-        #Then we reboot the dispatch_timers() function to re-check for the latest timer.
-        if self.current_timer and expires < self.current_timer.expires:
-            logging.debug("Reshuffled timers, this is now the latest timer.")
-            self.currenttask.cancel()
-            self.currenttask = self.bot.loop.create_task(self.dispatch_timers())
-        elif self.current_timer is None:
-            self.currenttask = self.bot.loop.create_task(self.dispatch_timers())
+        #If it expires within the loaded horizon, schedule it right away, this wakes the dispatcher if it is the next timer
+        #Other processes are told about it by the database, the notification this process receives for it is ignored
+        self.scheduler.push(Timer(id=timer_id, guild_id=guild_id, user_id=user_id, channel_id=channel_id, event=event, expires=expires, notes=notes))
 
-    #Loop every hour to check if any timers entered the 40 day max sleep range if we have no timers queued
-    #This allows us to have timers of infinite length practically
-    @tasks.loop(hours=1.0)
-    async def wait_for_active_timers(self):
-        if self.currenttask is None:
-            self.currenttask = self.bot.loop.create_task(self.dispatch_timers())
+    #Called by asyncpg for every notification on the timers channel
+    def on_timers_changed(self, con, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+            if change["op"] == "DELETE":
+                self.scheduler.cancel(change["id"])
+            else:
+                self.scheduler.push(Timer(id=change["id"], guild_id=change["guild_id"], user_id=change["user_id"], channel_id=change["channel_id"], event=change["event"], expires=change["expires"]))
+        except (ValueError, KeyError) as error:
+            logging.error(f"Received invalid timer notification '{payload}': {error}")
+
+    async def listen_timers(self):
+        '''
+        Keeps a connection listening for changes to the timers table, so they are scheduled within milliseconds
+        The connection is reconnected if it is lost, and every timer within the horizon is loaded again, as changes may have been missed
+        '''
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            #The connection is held for as long as the extension is loaded, so it is acquired from the underlying pool,
+            #which does not warn about long holds
+            try:
+                con = await self.bot.pool.pool.acquire()
+            except database_errors as error:
+                logging.error(f"Failed acquiring a connection to listen for timers, retrying: {error}")
+                await asyncio.sleep(5)
+                continue
+            closed = asyncio.Event()
+            def on_closed(con):
+                closed.set()
+            con.add_termination_listener(on_closed)
+            try:
+                #Listen before loading, so no timer created in between is missed
+                await con.add_listener("timers", self.on_timers_changed)
+                await self.scheduler.reload(self.bot)
+                self.start_dispatcher()
+                await closed.wait()
+                logging.warning("Lost the connection listening for timers, reconnecting.")
+            except database_errors as error:
+                logging.error(f"Failed listening for timers, retrying: {error}")
+                await asyncio.sleep(5)
+            finally:
+                #Releasing resets the connection, which also stops listening
+                con.remove_termination_listener(on_closed)
+                await self.bot.pool.pool.release(con)
+
+    #Loads the timers entering the horizon every half horizon, so the next batch is always loaded before it is needed
+    #This allows us to have timers of infinite length practically, timers created within the horizon are pushed by listen_timers
+    @tasks.loop(seconds=TimerScheduler.horizon / 2)
+    async def refill_timers(self):
+        #The first load is done by listen_timers
+        if self.scheduler.loaded_until == 0:
+            return
+        try:
+            await self.scheduler.refill(self.bot)
+        except database_errors as error:
+            logging.error(f"Failed loading timers: {error}")
+
+    @refill_timers.before_loop
+    async def before_refill_timers(self):
+        await self.bot.wait_until_ready()
+
+    #Timers whose claim ran out are no longer in the scheduler of any process, and are overdue by then, so they are picked up by a catch-up
+    @tasks.loop(seconds=lease_seconds)
+    async def reclaim_timers(self):
+        self.start_catch_up()
+
+    @reclaim_timers.before_loop
+    async def before_reclaim_timers(self):
+        await self.bot.wait_until_ready()
     
+    @commands.command(hidden=True, help="Shows timer statistics.", description="Shows how many timers are scheduled, and the progress of dispatching overdue timers.", usage="timerstats")
+    @commands.is_owner()
+    async def timerstats(self, ctx):
+        description = f"**Scheduled timers:** `{len(self.scheduler.timers)}`\n**Catch-up workers:** `{self.bot.timer_catchup_concurrency}`, rate limit `{self.bot.timer_catchup_rate or '-'}`/s"
+        progress = self.catchup
+        if progress:
+            now = self.bot.loop.time()
+            eta = progress.eta(now)
+            state = "running" if progress.finished_at is None else f"finished {round(now - progress.finished_at)}s ago"
+            description += f"\n**Last catch-up:** {state}\n**Dispatched:** `{progress.dispatched}`, `{round(progress.rate(now), 2)}`/s\n**Remaining:** `{progress.remaining}`, ETA `{round(eta) if eta is not None else '-'}s`"
+        embed=discord.Embed(title="📊 Timers", description=description, color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
+
     @commands.command(aliases=["remindme", "remind"], usage="reminder <when>", help="Sets a reminder to the specified time.", description="Sets a reminder with at the specified time, with an optional message.\n\n**Time formatting:**\n`s` or `second(s)`\n`m` or `minute(s)`\n`h` or `hour(s)`\n`d` or `day(s)`\n`w` or `week(s)`\n`M` or `month(s)`\n`Y` or `year(s)`\n\n**Example:** `reminder in 2 hours to go sleep` or `reminder 5d example message`")
     @commands.guild_only()
     async def reminder(self, ctx, *, timestr):
@@ -270,7 +624,7 @@ class Timers(commands.Cog):
     @commands.guild_only()
     async def reminders(self, ctx):
         async with self.bot.pool.acquire() as con:
-            results = await con.fetch('''SELECT * FROM timers WHERE guild_id = $1 AND user_id = $2 ORDER BY expires LIMIT 10''', ctx.guild.id, ctx.author.id)
+            results = await self.bot.queries.fetch(con, "timers.get_by_user", ctx.guild.id, ctx.author.id)
         timers = []
         reminderstr = ""
         for result in results :
@@ -298,16 +652,12 @@ class Timers(commands.Cog):
     @commands.guild_only()
     async def delreminder(self, ctx, ID : int):
         async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT ID FROM timers WHERE user_id = $1 AND id = $2''', ctx.author.id, ID)
-            if result:
-                await con.execute('''DELETE FROM timers WHERE user_id = $1 AND id = $2''', ctx.author.id, ID)
+            status = await self.bot.queries.execute(con, "timers.delete_by_user", ctx.author.id, ID)
+            if status == "DELETE 1":
                 embed = discord.Embed(title="✅ " + self._("Reminder deleted"), description=self._("Reminder **{ID}** has been deleted.").format(ID=ID), color=self.bot.embedGreen)
                 embed.set_footer(text=self.bot.requestFooter.format(user_name=ctx.author.name, discrim=ctx.author.discriminator), icon_url=ctx.author.avatar_url)
                 await ctx.send(embed=embed)
-                #If we just deleted the currently running timer, then we re-evaluate to find the next timer.
-                if self.current_timer and self.current_timer.id == int(ID):
-                    self.currenttask.cancel()
-                    self.currenttask = self.bot.loop.create_task(self.dispatch_timers())
+                self.scheduler.cancel(ID)
             else:
                 embed = discord.Embed(title="❌ " + self._("Reminder not found"), description=self._("Cannot find reminder with ID **{ID}**.").format(ID=ID), color=self.bot.errorColor)
                 embed.set_footer(text=self.bot.requestFooter.format(user_name=ctx.author.name, discrim=ctx.author.discriminator), icon_url=ctx.author.avatar_url)
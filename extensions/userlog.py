@@ -1,30 +1,717 @@
 import asyncio
 import datetime
+import functools
+import io
 import logging
+import re
+import sys
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 
 import asyncpg
 import discord
-from discord.ext import commands
+from discord.ext import commands, menus
+from discord.http import Route
+
+async def hasPriviliged(ctx):
+    return await ctx.bot.CommandChecks.hasPriviliged(ctx)
+
+
+class LogSink():
+    '''
+    Buffers log entries per channel, and sends them in batches of up to 10 embeds per message after a short flush window,
+    so bursts of events (raids, purges) do not get rate-limited into sending one message per event
+    Every channel is flushed by a single task in order, if a channel falls too far behind, new entries are counted
+    & summarized instead of queued
+    Strings & entries with a file attached are sent as a message of their own
+    '''
+
+    flush_window = 2.0 #Seconds to gather entries for before sending
+    max_queue = 50 #Entries per channel, beyond this new entries are suppressed
+    max_embeds = 10 #Discord's limit of embeds per message
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queues = {} #In the format of channel_id:deque of (queued_at, logcontent, fallback_channel, file)
+        self.suppressed = {} #In the format of channel_id:amount
+        self.flushers = {} #In the format of channel_id:task
+        self.flush_latencies = deque(maxlen=1000) #Seconds between the oldest entry in a batch being queued, and the batch being sent
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    def put(self, channel, logcontent, fallback=None, file=None):
+        '''
+        Queues an embed or string to be sent to channel, optionally with a discord.File attached, returns immediately
+        If sending to channel is forbidden, the entry is sent to fallback instead, if provided
+        '''
+        queue = self.queues.setdefault(channel.id, deque())
+        if len(queue) >= self.max_queue:
+            if not self.suppressed.get(channel.id):
+                logging.warning(f"Log channel {channel.id} is falling behind, suppressing log entries.")
+            self.suppressed[channel.id] = self.suppressed.get(channel.id, 0) + 1
+        else:
+            queue.append((time.perf_counter(), logcontent, fallback, file))
+        if channel.id not in self.flushers:
+            self.flushers[channel.id] = self.bot.loop.create_task(self._flush_loop(channel))
+
+    async def _flush_loop(self, channel):
+        queue = self.queues[channel.id]
+        try:
+            while queue or self.suppressed.get(channel.id):
+                #Only wait if the queue is not full, otherwise send right away to catch up
+                if len(queue) < self.max_embeds:
+                    await asyncio.sleep(self.flush_window)
+                await self._flush_batch(channel, queue)
+        finally:
+            self.flushers.pop(channel.id, None)
+            if not queue:
+                self.queues.pop(channel.id, None)
+
+    @staticmethod
+    def _sent_alone(entry):
+        return isinstance(entry[1], str) or entry[3] is not None
+
+    async def _flush_batch(self, channel, queue):
+        '''
+        Sends the next message worth of entries, a string or an entry with a file is sent on it's own to keep the order of entries
+        '''
+        batch = []
+        while queue and len(batch) < self.max_embeds:
+            if self._sent_alone(queue[0]) and batch:
+                break
+            batch.append(queue.popleft())
+            if self._sent_alone(batch[-1]):
+                break
+        if not queue and self.suppressed.get(channel.id) and len(batch) < self.max_embeds and not (batch and self._sent_alone(batch[0])):
+            embed = discord.Embed(title="⚠️ Log entries suppressed", description=f"**{self.suppressed.pop(channel.id)}** more events were not logged, as too many events happened at once.", color=self.bot.warnColor)
+            batch.append((time.perf_counter(), embed, None, None))
+        if not batch:
+            return
+
+        try:
+            if batch[0][3]:
+                content = batch[0][1] if isinstance(batch[0][1], str) else None
+                embed = batch[0][1] if isinstance(batch[0][1], discord.Embed) else None
+                await channel.send(content=content, embed=embed, file=batch[0][3])
+            else:
+                if isinstance(batch[0][1], str):
+                    payload = {"content": batch[0][1]}
+                else:
+                    payload = {"embeds": [entry[1].to_dict() for entry in batch]}
+                #Sent without channel.send(), so the bot-wide mention restrictions have to be applied here
+                if self.bot.allowed_mentions:
+                    payload["allowed_mentions"] = self.bot.allowed_mentions.to_dict()
+                await self.bot.http.request(Route('POST', '/channels/{channel_id}/messages', channel_id=channel.id), json=payload)
+        except discord.Forbidden:
+            for queued_at, logcontent, fallback, file in batch:
+                if fallback:
+                    if file:
+                        file.reset()
+                    self.put(fallback, logcontent, file=file)
+        except discord.HTTPException as error:
+            logging.error(f"Failed sending log entries to channel {channel.id}: {error}")
+        self.flush_latencies.append(time.perf_counter() - batch[0][0])
+
+    async def close(self):
+        '''
+        Sends everything that is still queued right away
+        '''
+        for task in self.flushers.values():
+            task.cancel()
+        for channel_id, queue in list(self.queues.items()):
+            channel = self.bot.get_channel(channel_id)
+            while channel and (queue or self.suppressed.get(channel_id)):
+                await self._flush_batch(channel, queue)
+        self.queues = {}
+
+
+class AuditLogs():
+    '''
+    Shared audit log fetcher, fetches the recent audit log entries of a guild in one request, and indexes them by (action, target_id)
+    Lookups for the same guild that happen at the same time share a single request, and fetched entries are reused for ttl seconds
+    Only entries created less than max_age seconds before the lookup are returned, so an old entry for the same target is never
+    attributed to a new event, lookups that found nothing are remembered for ttl seconds as well
+    Discord groups repeated message deletions by the same moderator into one entry that keeps its creation time,
+    so such an entry also counts as new if its count went up since the previous request
+    '''
+
+    ttl = 5.0
+    max_age = 10.0
+    fetch_limit = 100 #Maximum amount of entries Discord returns in one request
+    max_misses = 10000
+
+    @dataclass
+    class GuildEntries:
+        '''
+        Represents the indexed audit log entries of a guild, started_at is when the request was sent
+        '''
+        started_at:float
+        index:dict
+        bumped:set=field(default_factory=set) #Keys of grouped entries whose count went up since the previous request
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.entries = {} #In the format of guild_id:GuildEntries
+        self.pending = {} #In the format of guild_id:(started_at, task)
+        self.misses = {} #In the format of (guild_id, action, target_id):time.monotonic() of the lookup that found nothing
+        self.requests = 0
+        self.lookups = 0
+
+    async def _fetch(self, guild, started_at):
+        self.requests += 1
+        index = {}
+        #Newest entries come first, so only the most recent entry for every (action, target_id) is kept
+        async for entry in guild.audit_logs(limit=self.fetch_limit):
+            index.setdefault((entry.action, getattr(entry.target, "id", None)), entry)
+        entries = self.GuildEntries(started_at=started_at, index=index)
+        current = self.entries.get(guild.id)
+        if current:
+            for key, entry in index.items():
+                previous = current.index.get(key)
+                if key[0] == discord.AuditLogAction.message_delete and previous and previous.id == entry.id and entry.extra.count > previous.extra.count:
+                    entries.bumped.add(key)
+        if current is None or current.started_at < started_at:
+            self.entries[guild.id] = entries
+        return entries
+
+    def _is_new(self, entries, key):
+        return self._is_recent(entries.index.get(key)) or key in entries.bumped
+
+    def _is_recent(self, entry, max_age=None):
+        return entry is not None and datetime.datetime.utcnow() - entry.created_at <= datetime.timedelta(seconds=max_age or self.max_age)
+
+    def _add_miss(self, key, now):
+        if len(self.misses) >= self.max_misses:
+            self.misses = {miss: missed_at for miss, missed_at in self.misses.items() if missed_at >= now - self.ttl}
+        self.misses[key] = now
+
+    def _on_fetched(self, guild_id, task):
+        if guild_id in self.pending and self.pending[guild_id][1] is task:
+            del self.pending[guild_id]
+
+    async def find(self, guild, action, target_id):
+        '''
+        Returns the most recent audit log entry of action for target_id created within max_age seconds, or None if not found
+        If no such entry is cached, the audit log is fetched again, joining any request sent less than half a second ago
+        Raises discord.Forbidden if the bot cannot view the audit log
+        '''
+        self.lookups += 1
+        now = time.monotonic()
+        miss_key = (guild.id, action, target_id)
+        missed_at = self.misses.get(miss_key)
+        if missed_at is not None and missed_at >= now - self.ttl:
+            return None
+        entries = self.entries.get(guild.id)
+        key = (action, target_id)
+        #Entries fetched before the event happened might not contain it yet, so the first miss checks again
+        if entries is None or entries.started_at < now - self.ttl or not self._is_new(entries, key):
+            pending = self.pending.get(guild.id)
+            #Join a request that is already running if it was sent recently, otherwise send a new one
+            if pending is None or pending[0] < now - 0.5:
+                task = self.bot.loop.create_task(self._fetch(guild, now))
+                pending = (now, task)
+                self.pending[guild.id] = pending
+                task.add_done_callback(functools.partial(self._on_fetched, guild.id))
+            entries = await asyncio.shield(pending[1])
+            if not self._is_new(entries, key):
+                self._add_miss(miss_key, now)
+                return None
+        return entries.index[key]
+
+    async def index_since(self, guild, since):
+        '''
+        Returns all indexed audit log entries of the guild in the format of (action, target_id):entry, fetched after since
+        since is a time.monotonic() timestamp, this is used to look up many entries with a single request
+        Entries created more than max_age seconds before since are left out
+        Raises discord.Forbidden if the bot cannot view the audit log
+        '''
+        self.lookups += 1
+        entries = self.entries.get(guild.id)
+        if entries is None or entries.started_at < since:
+            pending = self.pending.get(guild.id)
+            if pending is None or pending[0] < since:
+                now = time.monotonic()
+                task = self.bot.loop.create_task(self._fetch(guild, now))
+                pending = (now, task)
+                self.pending[guild.id] = pending
+                task.add_done_callback(functools.partial(self._on_fetched, guild.id))
+            entries = await asyncio.shield(pending[1])
+        max_age = time.monotonic() - since + self.max_age
+        return {key: entry for key, entry in entries.index.items() if self._is_recent(entry, max_age)}
+
+
+class MemberChanges():
+    '''
+    Gathers the role & nickname changes of members per guild for a short window, then logs them as one summary per moderator,
+    so mass role updates by bots or admins need a single audit log request & produce a single log entry
+    '''
+
+    window = 3.0 #Seconds to gather changes for after the first one
+    max_lines = 30 #Members listed in a summary, the rest are counted
+
+    @dataclass
+    class Change:
+        '''
+        Represents the net changes of a member within the window
+        '''
+        member:discord.Member
+        roles_added:set=field(default_factory=set)
+        roles_removed:set=field(default_factory=set)
+        nick_changed:bool=False
+        nick_before:str=None
+        nick_after:str=None
+
+    def __init__(self, cog):
+        self.cog = cog
+        self.bot = cog.bot
+        self.pending = {} #In the format of guild_id:{member_id:Change}
+        self.last_change = {} #In the format of guild_id:time.monotonic() of the last change
+        self.flushers = {} #In the format of guild_id:task
+
+    def add(self, before, after, roles=False, nickname=False):
+        changes = self.pending.setdefault(after.guild.id, {})
+        if after.id not in changes:
+            changes[after.id] = self.Change(member=after)
+        change = changes[after.id]
+        change.member = after
+        if roles:
+            #A role that is added & removed again within the window cancels out
+            for role in set(after.roles) - set(before.roles):
+                if role in change.roles_removed:
+                    change.roles_removed.remove(role)
+                else:
+                    change.roles_added.add(role)
+            for role in set(before.roles) - set(after.roles):
+                if role in change.roles_added:
+                    change.roles_added.remove(role)
+                else:
+                    change.roles_removed.add(role)
+        if nickname:
+            if not change.nick_changed:
+                change.nick_changed = True
+                change.nick_before = before.nick
+            change.nick_after = after.nick
+        self.last_change[after.guild.id] = time.monotonic()
+        if after.guild.id not in self.flushers:
+            self.flushers[after.guild.id] = self.bot.loop.create_task(self._flush_later(after.guild.id))
+
+    async def _flush_later(self, guild_id):
+        await asyncio.sleep(self.window)
+        #Changes that come in while flushing start a new window
+        self.flushers.pop(guild_id, None)
+        await self._flush(guild_id)
+
+    async def _flush(self, guild_id):
+        changes = self.pending.pop(guild_id, {})
+        since = self.last_change.pop(guild_id, 0)
+        guild = self.bot.get_guild(guild_id)
+        if not changes or guild is None:
+            return
+        try:
+            #The audit log entries of every change in the window are written before the last one was received
+            index = await self.cog.audit_logs.index_since(guild, since)
+        except discord.Forbidden:
+            index = {}
+        role_changes = {} #In the format of moderator_id:(moderator, [Change])
+        nick_changes = {}
+        for change in changes.values():
+            if change.roles_added or change.roles_removed:
+                entry = index.get((discord.AuditLogAction.member_role_update, change.member.id))
+                moderator = entry.user if entry else None
+                role_changes.setdefault(getattr(moderator, "id", None), (moderator, []))[1].append(change)
+            if change.nick_changed and change.nick_before != change.nick_after:
+                entry = index.get((discord.AuditLogAction.member_update, change.member.id))
+                moderator = entry.user if entry else None
+                nick_changes.setdefault(getattr(moderator, "id", None), (moderator, []))[1].append(change)
+
+        for moderator_id, (moderator, members) in role_changes.items():
+            lines = []
+            for change in members:
+                roles = [f"+`{role}`" for role in change.roles_added] + [f"-`{role}`" for role in change.roles_removed]
+                lines.append(f"`{change.member} ({change.member.id})`: {', '.join(roles)}")
+            title = "🖊️ Member roles updated" if len(members) == 1 else f"🖊️ Member roles updated ({len(members)} members)"
+            embed = discord.Embed(title=title, description=f"**Moderator:** `{moderator or 'Undefined'} ({moderator_id})`\n{self._join(lines)}", color=self.bot.embedBlue)
+            user_id = members[0].member.id if len(members) == 1 else None
+            #Role updates are considered elevated due to importance, unless the bot did them
+            if moderator_id == self.bot.user.id:
+                await self.cog.log_standard(embed, guild_id, event_type="roles", user_id=user_id, moderator_id=moderator_id)
+            else:
+                await self.cog.log_elevated(embed, guild_id, event_type="roles", user_id=user_id, moderator_id=moderator_id)
+
+        for moderator_id, (moderator, members) in nick_changes.items():
+            lines = [f"`{change.member} ({change.member.id})`: `{change.nick_before}` ---> `{change.nick_after}`" for change in members]
+            title = "🖊️ Nickname changed" if len(members) == 1 else f"🖊️ Nicknames changed ({len(members)} members)"
+            moderator_line = f"**Moderator:** `{moderator} ({moderator_id})`\n" if moderator else ""
+            embed = discord.Embed(title=title, description=f"{moderator_line}{self._join(lines)}", color=self.bot.embedBlue)
+            user_id = members[0].member.id if len(members) == 1 else None
+            await self.cog.log_standard(embed, guild_id, event_type="nickname", user_id=user_id, moderator_id=moderator_id)
+
+    def _join(self, lines):
+        text = "\n".join(lines[:self.max_lines])
+        if len(lines) > self.max_lines:
+            text = f"{text}\n*...and {len(lines) - self.max_lines} more members.*"
+        return text[:4000]
+
+    async def close(self):
+        '''
+        Logs everything that is still pending right away
+        '''
+        for task in self.flushers.values():
+            task.cancel()
+        self.flushers = {}
+        for guild_id in list(self.pending.keys()):
+            await self._flush(guild_id)
+
+
+class JoinMonitor():
+    '''
+    Counts the joins of every guild in a sliding window, once a guild goes above threshold joins per window,
+    joins are logged as one summary per window instead of one entry each, until a window passes below the threshold again
+    Only two counters are kept per guild, the window is approximated by weighting the previous window's count
+    '''
+
+    window = 10.0 #Seconds
+    threshold = 10 #Joins per window
+    max_listed = 50 #Account IDs listed in a summary, the rest are counted
+    #Upper bounds of the account age histogram buckets, in days
+    age_buckets = ((1, "< 1 day"), (7, "< 1 week"), (30, "< 1 month"), (365, "< 1 year"), (float("inf"), "Older"))
+
+    @dataclass
+    class GuildJoins:
+        '''
+        Represents the join counters of a guild, and the joins gathered for the next summary during a join storm
+        '''
+        window_start:float
+        current:int=0
+        previous:int=0
+        storm_started:float=None
+        storm_joins:int=0
+        listed:list=field(default_factory=list)
+        unlisted:int=0
+        ages:list=None
+
+    def __init__(self, cog):
+        self.cog = cog
+        self.bot = cog.bot
+        self.guilds = {} #In the format of guild_id:GuildJoins
+        self.summarizers = {} #In the format of guild_id:task
+
+    def _rate(self, joins, now):
+        elapsed = now - joins.window_start
+        if elapsed >= self.window:
+            windows = int(elapsed // self.window)
+            joins.previous = joins.current if windows == 1 else 0
+            joins.current = 0
+            joins.window_start += windows * self.window
+        return joins.previous * (1 - (now - joins.window_start) / self.window) + joins.current
+
+    def record(self, member):
+        '''
+        Counts the join of member, returns True if it is part of a join storm & will be logged in the next summary
+        '''
+        now = time.monotonic()
+        if member.guild.id not in self.guilds:
+            self.guilds[member.guild.id] = self.GuildJoins(window_start=now)
+        joins = self.guilds[member.guild.id]
+        self._rate(joins, now)
+        joins.current += 1
+        if joins.storm_started is None:
+            rate = self._rate(joins, now)
+            if rate <= self.threshold:
+                return False
+            joins.storm_started = now
+            self.summarizers[member.guild.id] = self.bot.loop.create_task(self._summarize_loop(member.guild.id))
+            embed = discord.Embed(title="⚠️ Join storm detected", description=f"**{round(rate)}** users joined in the last `{round(self.window)}` seconds.\nJoins are now logged as a summary every `{round(self.window)}` seconds, until the rate of joins drops again.", color=self.bot.warnColor)
+            self.bot.loop.create_task(self.cog.log_elevated(embed, member.guild.id, event_type="join_storm"))
+
+        joins.storm_joins += 1
+        if len(joins.listed) < self.max_listed:
+            joins.listed.append(member.id)
+        else:
+            joins.unlisted += 1
+        if joins.ages is None:
+            joins.ages = [0] * len(self.age_buckets)
+        age = (datetime.datetime.utcnow() - member.created_at).days
+        for i, (bound, name) in enumerate(self.age_buckets):
+            if age < bound:
+                joins.ages[i] += 1
+                break
+        return True
+
+    async def _summarize_loop(self, guild_id):
+        joins = self.guilds[guild_id]
+        ended = False
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                await self._summarize(guild_id, joins)
+                if self._rate(joins, time.monotonic()) <= self.threshold:
+                    break
+            #End the storm before awaiting anything, so later joins are logged individually,
+            #then summarize the joins that came in while the last summary was being sent
+            duration = round(time.monotonic() - joins.storm_started)
+            storm_joins = joins.storm_joins
+            joins.storm_started = None
+            joins.storm_joins = 0
+            ended = True
+            await self._summarize(guild_id, joins)
+            embed = discord.Embed(title="✅ Join storm ended", description=f"**{storm_joins}** users joined over `{duration}` seconds. Joins are logged individually again.", color=self.bot.embedGreen)
+            await self.cog.log_elevated(embed, guild_id, event_type="join_storm")
+        finally:
+            if not ended:
+                joins.storm_started = None
+                joins.storm_joins = 0
+            #A new storm may have started while the last summary was sent
+            if self.summarizers.get(guild_id) is asyncio.current_task():
+                del self.summarizers[guild_id]
+
+    async def _summarize(self, guild_id, joins):
+        count = len(joins.listed) + joins.unlisted
+        if not count:
+            return
+        histogram = "\n".join(f"`{name}`: **{amount}**" for (bound, name), amount in zip(self.age_buckets, joins.ages) if amount)
+        user_ids = " ".join(str(user_id) for user_id in joins.listed)
+        if joins.unlisted:
+            user_ids = f"{user_ids}\n...and {joins.unlisted} more"
+        guild = self.bot.get_guild(guild_id)
+        member_count = guild.member_count if guild else "?"
+        embed = discord.Embed(title=f"🚪 {count} users joined", description=f"**User count:** `{member_count}`\n**Account ages:**\n{histogram}\n**User IDs:** ```{user_ids}```", color=self.bot.embedGreen)
+        joins.listed = []
+        joins.unlisted = 0
+        joins.ages = None
+        await self.cog.log_standard(embed, guild_id, event_type="join")
+
+    def close(self):
+        for task in self.summarizers.values():
+            task.cancel()
+
+
+class MessageStore():
+    '''
+    Keeps the content of recent messages in guilds that have logging set up, so edits & deletions can show what a message said
+    even after discord.py's own message cache dropped it
+    Only the fields logging needs are kept, the least recently seen messages are evicted once max_bytes is exceeded
+    '''
+
+    class StoredMessage():
+        '''
+        Represents the loggable part of a message
+        '''
+        __slots__ = ("author_id", "channel_id", "content", "has_files", "size")
+
+        def __init__(self, author_id, channel_id, content, has_files):
+            self.author_id = author_id
+            self.channel_id = channel_id
+            self.content = content
+            self.has_files = has_files
+            self.size = MessageStore.overhead + sys.getsizeof(content)
+
+    #Approximate size of a stored message without its content, including its entry in the store
+    overhead = 200
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.messages = OrderedDict() #In the format of message_id:StoredMessage, least recently seen first
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, message_id, author_id, channel_id, content, has_files=False):
+        self.pop(message_id)
+        stored = self.StoredMessage(author_id, channel_id, content, has_files)
+        self.messages[message_id] = stored
+        self.size += stored.size
+        while self.size > self.max_bytes and self.messages:
+            _, evicted = self.messages.popitem(last=False)
+            self.size -= evicted.size
+
+    def get(self, message_id):
+        stored = self.messages.get(message_id)
+        if stored is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.messages.move_to_end(message_id)
+        return stored
+
+    def pop(self, message_id):
+        stored = self.messages.pop(message_id, None)
+        if stored is not None:
+            self.size -= stored.size
+        return stored
+
+
+class EventStore():
+    '''
+    Writes every log entry to the mod_log_events table in the background, in batches via COPY
+    put() never waits on the database, if writing falls too far behind, the oldest unwritten entries are dropped
+    '''
+
+    flush_interval = 5.0 #Seconds to gather entries for before writing, unless a full batch is waiting
+    batch_size = 500
+    max_queue = 50000
+    columns = ("guild_id", "event_type", "user_id", "moderator_id", "content", "created_at")
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.queue = deque() #Records in the order of columns
+        self.partitions = set() #Months that are known to have a partition
+        self.writer = None
+        self.written = 0
+        self.dropped = 0
+
+    def put(self, guild_id, event_type, user_id=None, moderator_id=None, content=None):
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append((guild_id, event_type, user_id, moderator_id, content, datetime.datetime.now(datetime.timezone.utc)))
+        if self.writer is None:
+            self.writer = self.bot.loop.create_task(self._write_loop())
+
+    def discard(self, guild_id):
+        '''
+        Drops the entries of a guild that were not written yet, used when the data of a guild is erased
+        '''
+        self.queue = deque(record for record in self.queue if record[0] != guild_id)
+
+    async def _write_loop(self):
+        try:
+            while self.queue:
+                if len(self.queue) < self.batch_size:
+                    await asyncio.sleep(self.flush_interval)
+                await self._write_batch()
+        finally:
+            self.writer = None
+
+    async def _write_batch(self):
+        batch = [self.queue.popleft() for i in range(min(self.batch_size, len(self.queue)))]
+        if not batch:
+            return
+        try:
+            async with self.bot.pool.acquire() as con:
+                months = {record[5].date().replace(day=1) for record in batch}
+                #Create next month's partition ahead of time, so the first write of a month does not have to
+                months.add((max(months) + datetime.timedelta(days=32)).replace(day=1))
+                for month in sorted(months - self.partitions):
+                    await self._create_partition(con, month)
+                await con.copy_records_to_table("mod_log_events", records=batch, columns=self.columns)
+            self.written += len(batch)
+        except Exception as error:
+            #Any error, including a closed pool, only costs this batch, so the writer keeps running
+            self.dropped += len(batch)
+            logging.error(f"Failed writing {len(batch)} log events to the database: {error}")
+
+    async def _create_partition(self, con, month):
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        try:
+            await con.execute(f'''
+            CREATE TABLE IF NOT EXISTS public.mod_log_events_{month:%Y_%m} PARTITION OF public.mod_log_events
+            FOR VALUES FROM ('{month.isoformat()} 00:00+00') TO ('{next_month.isoformat()} 00:00+00')''')
+        except (asyncpg.DuplicateTableError, asyncpg.UniqueViolationError):
+            pass #Another instance created it at the same time, which can also fail with a conflict in the catalog
+        self.partitions.add(month)
+
+    async def close(self):
+        '''
+        Writes everything that is still queued right away
+        '''
+        if self.writer:
+            self.writer.cancel()
+        while self.queue:
+            await self._write_batch()
+
+
+class ModLogSource(menus.PageSource):
+    '''
+    Pages through the results of a modlog search, each page is fetched when it is first shown
+    Pages are fetched with keyset pagination, so later pages are as cheap to fetch as the first one
+    '''
+
+    per_page = 10
+
+    def __init__(self, bot, query, args):
+        self.bot = bot
+        self.query = query #Takes args, then the created_at & id of the last row already shown as the last 2 arguments
+        self.args = args
+        self.pages = []
+        self.exhausted = False
+
+    async def prepare(self):
+        await self._fetch_next()
+
+    def is_paginating(self):
+        return not self.exhausted or len(self.pages) > 1
+
+    def get_max_pages(self):
+        return len(self.pages) if self.exhausted else None
+
+    async def get_page(self, page_number):
+        while page_number >= len(self.pages) and not self.exhausted:
+            await self._fetch_next()
+        return self.pages[page_number]
+
+    async def _fetch_next(self):
+        if self.pages:
+            cursor = (self.pages[-1][-1]["created_at"], self.pages[-1][-1]["id"])
+        else:
+            cursor = (datetime.datetime.max.replace(tzinfo=datetime.timezone.utc), 2**63 - 1)
+        async with self.bot.pool.acquire() as con:
+            #Fetch one extra row to know if there is a next page
+            rows = await con.fetch(self.query, *self.args, *cursor, self.per_page + 1)
+        self.exhausted = len(rows) <= self.per_page
+        if rows or not self.pages:
+            self.pages.append(rows[:self.per_page])
+
+    async def format_page(self, menu, entries):
+        if not entries:
+            return discord.Embed(title="🔍 Moderation log", description="No log entries found.", color=self.bot.embedBlue)
+        lines = []
+        for row in entries:
+            content = (row["content"] or "").replace("```", "").replace("\n", " ")
+            if len(content) > 150:
+                content = content[:150] + "..."
+            user = f" **User:** `{row['user_id']}`" if row["user_id"] else ""
+            moderator = f" **Moderator:** `{row['moderator_id']}`" if row["moderator_id"] else ""
+            lines.append(f"`#{row['id']}` <t:{int(row['created_at'].timestamp())}:f> `{row['event_type']}`{user}{moderator}\n{content}")
+        pages = self.get_max_pages() or "?"
+        embed = discord.Embed(title="🔍 Moderation log", description="\n\n".join(lines), color=self.bot.embedBlue)
+        embed.set_footer(text=f"Page {menu.current_page + 1}/{pages}")
+        return embed
 
 
 #Main user-facing logging
 class Logging(commands.Cog):
+
+    #Types of events that can be logged, entries without a type are logged as "other"
+    #Every type is a bit in the log_events bitmask of log_config, in this order, so new types must be appended to the end
+    event_types = ("message_delete", "message_edit", "bulk_delete", "invite_delete", "role_create", "role_update", "role_delete",
+    "channel_create", "channel_delete", "guild_update", "ban", "unban", "kick", "leave", "join", "command", "nickname", "roles",
+    "member_state", "warn", "mute", "unmute", "reaction_role", "other", "join_storm")
+    event_flags = {event_type: 1 << i for i, event_type in enumerate(event_types)}
+    #Seconds an uncached message's edit timestamp may lie in the past for the update to be logged as an edit
+    edit_max_age = 60
+
     def __init__(self, bot):
         self.bot = bot
-        async def init_table():
-            async with bot.pool.acquire() as con:
-                await con.execute('''
-                CREATE TABLE IF NOT EXISTS public.log_config
-                (
-                    guild_id bigint NOT NULL,
-                    log_channel_id bigint NOT NULL,
-                    elevated_log_channel_id bigint,
-                    PRIMARY KEY (guild_id),
-                    FOREIGN KEY (guild_id)
-                        REFERENCES global_config (guild_id)
-                        ON DELETE CASCADE
-                )''')
-        bot.loop.run_until_complete(init_table())
+        bot.require_schema(4)
+        self.sink = LogSink(bot)
+        self.audit_logs = AuditLogs(bot)
+        self.messages = MessageStore(bot.message_store_bytes)
+        self.events = EventStore(bot)
+        self.member_changes = MemberChanges(self)
+        self.joins = JoinMonitor(self)
+        #Uncached edits logged straight from the gateway payload, and ones that needed a REST fetch because the payload was incomplete
+        self.payload_edits = 0
+        self.edit_fetch_fallbacks = 0
+
+    def cog_unload(self):
+        self.bot.loop.create_task(self.sink.close())
+        self.bot.loop.create_task(self.events.close())
+        self.bot.loop.create_task(self.member_changes.close())
+        self.joins.close()
 
     '''
     Functions to call to log events, standard
@@ -32,65 +719,97 @@ class Logging(commands.Cog):
     elevated is generally for important entries,
     like kicks or bans. Elevated is optional, thus it
     has the ability to fall back to standard
+
+    Every entry is also stored in the database under event_type,
+    user_id & moderator_id are stored with it for searching
+    Entries are dropped if event_type is disabled in the guild
     '''
 
-    async def log_standard(self, logcontent, guild_id):
-        async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT log_channel_id FROM log_config WHERE guild_id = $1''', guild_id)
-            if len(result) == 0:
-                return
-            loggingchannelID = result[0].get('log_channel_id')
-            guild = self.bot.get_guild(guild_id)
-            loggingchannel = guild.get_channel(loggingchannelID)
-            try:
-                if isinstance(logcontent, discord.Embed):
-                    await loggingchannel.send(embed=logcontent)
-                elif isinstance(logcontent, str):
-                    await loggingchannel.send(content=logcontent)
-            except discord.Forbidden:
-                return
-        
+    @classmethod
+    def event_mask(cls, event_types):
+        '''
+        Returns the log_events bitmask enabling only event_types
+        '''
+        mask = 0
+        for event_type in event_types:
+            mask |= cls.event_flags[event_type]
+        return mask
 
-    async def log_elevated(self, logcontent, guild_id):
-        async with self.bot.pool.acquire() as con:
-            result = await con.fetch('''SELECT elevated_log_channel_id FROM log_config WHERE guild_id = $1''', guild_id)
-            if len(result) == 0:
-                return
-            elevated_loggingchannelID = result[0].get('elevated_log_channel_id')
-            if elevated_loggingchannelID:
-                guild = self.bot.get_guild(guild_id)
-                elevated_loggingchannel = guild.get_channel(elevated_loggingchannelID)
-                try:
-                    if isinstance(logcontent, discord.Embed):
-                        await elevated_loggingchannel.send(embed=logcontent)
-                    elif isinstance(logcontent, str):
-                        await elevated_loggingchannel.send(content=logcontent)
-                except discord.Forbidden:
-                    await self.log_standard(logcontent, guild_id)
+    async def is_enabled(self, guild_id, *event_types):
+        '''
+        Returns if logging is set up in the guild with any of event_types enabled
+        Served from the guild config cache, so listeners can call this before doing any other work
+        '''
+        config = await self.bot.guild_configs.get(guild_id)
+        if config.log_channel_id is None:
+            return False
+        return any(config.log_events & self.event_flags[event_type] for event_type in event_types)
+
+    async def log_standard(self, logcontent, guild_id, event_type="other", user_id=None, moderator_id=None, file=None):
+        config = await self.bot.guild_configs.get(guild_id)
+        if config.log_channel_id is None or not config.log_events & self.event_flags[event_type]:
+            return
+        self.store_event(logcontent, guild_id, event_type, user_id, moderator_id)
+        self.send_standard(logcontent, guild_id, config, file)
+
+    async def log_elevated(self, logcontent, guild_id, event_type="other", user_id=None, moderator_id=None, file=None):
+        config = await self.bot.guild_configs.get(guild_id)
+        if config.log_channel_id is None or not config.log_events & self.event_flags[event_type]:
+            return
+        self.store_event(logcontent, guild_id, event_type, user_id, moderator_id)
+        if config.elevated_log_channel_id:
+            guild = self.bot.get_guild(guild_id)
+            elevated_loggingchannel = guild.get_channel(config.elevated_log_channel_id)
+            if elevated_loggingchannel and isinstance(logcontent, (discord.Embed, str)):
+                #If the elevated channel is not accessible, fall back to the standard channel
+                self.sink.put(elevated_loggingchannel, logcontent, fallback=guild.get_channel(config.log_channel_id), file=file)
             else:
-                await self.log_standard(logcontent, guild_id) #Fallback to standard logging channel
+                self.send_standard(logcontent, guild_id, config, file)
+        else:
+            self.send_standard(logcontent, guild_id, config, file) #Fallback to standard logging channel
+
+    def send_standard(self, logcontent, guild_id, config, file=None):
+        guild = self.bot.get_guild(guild_id)
+        loggingchannel = guild.get_channel(config.log_channel_id)
+        if loggingchannel and isinstance(logcontent, (discord.Embed, str)):
+            self.sink.put(loggingchannel, logcontent, file=file)
+
+    def store_event(self, logcontent, guild_id, event_type, user_id, moderator_id):
+        if isinstance(logcontent, discord.Embed):
+            content = f"{logcontent.title}\n{logcontent.description}"
+        else:
+            content = str(logcontent)
+        self.events.put(guild_id, event_type, user_id, moderator_id, content)
 
 
+    #Message content storage, so edits & deletions can be logged with the original content
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        if message.guild == None or message.author == self.bot.user :
+            return
+        if await self.is_enabled(message.guild.id, "message_delete", "message_edit", "bulk_delete"):
+            self.messages.put(message.id, message.author.id, message.channel.id, message.content, bool(message.attachments))
+
     #Message deletion logging
 
     #First, if the message was cached, provide detailed info
     @commands.Cog.listener()
     async def on_message_delete(self, message):
+        self.messages.pop(message.id)
         #Guild-only, self ignored
         if message.guild == None or message.author == self.bot.user :
             return
-        #Add it to the recently deleted so on_raw_message_delete will ignore this
-        self.bot.recentlyDeleted.append(message.id)
+        if not await self.is_enabled(message.guild.id, "message_delete"):
+            return
+        #Add it to the recently deleted so raw delete handlers can tell it was already logged
+        self.bot.recentlyDeleted.add(message.id)
         #Then do info collection & dump
         moderator = None
         try:
-            async for entry in message.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.message_delete:
-                    if entry.target == message.author :
-                        moderator = entry.user
-                        break
-                else :
-                    break
+            entry = await self.audit_logs.find(message.guild, discord.AuditLogAction.message_delete, message.author.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             pass
         contentfield = message.content
@@ -101,11 +820,45 @@ class Logging(commands.Cog):
         if message.author != self.bot.user :
             if moderator != None: #If this was deleted by a mod
                 embed = discord.Embed(title=f"🗑️ Message deleted by Moderator", description=f"**Message author:** `{message.author} ({message.author.id})`\n**Moderator:** `{moderator} ({moderator.id})`\n**Channel:** {message.channel.mention}\n**Message content:** ```{contentfield}```", color=self.bot.errorColor)
-                await self.log_elevated(embed, message.guild.id)
+                await self.log_elevated(embed, message.guild.id, event_type="message_delete", user_id=message.author.id, moderator_id=moderator.id)
             else:
                 #Logging channel
                 embed = discord.Embed(title=f"🗑️ Message deleted", description=f"**Message author:** `{message.author} ({message.author.id})`\n**Channel:** {message.channel.mention}\n**Message content:** ```{contentfield}```", color=self.bot.errorColor)
-                await self.log_standard(embed, message.guild.id) 
+                await self.log_standard(embed, message.guild.id, event_type="message_delete", user_id=message.author.id)
+
+    #If the message was not in discord.py's cache, fall back to the message store
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        if payload.guild_id == None or payload.cached_message is not None or payload.message_id in self.bot.recentlyDeleted :
+            return
+        if not await self.is_enabled(payload.guild_id, "message_delete"):
+            return
+        stored = self.messages.pop(payload.message_id)
+        guild = self.bot.get_guild(payload.guild_id)
+        if stored is None or guild is None:
+            return
+        self.bot.recentlyDeleted.add(payload.message_id)
+        channel = guild.get_channel(payload.channel_id)
+        author = guild.get_member(stored.author_id) or self.bot.get_user(stored.author_id)
+        author_name = f"{author} ({author.id})" if author else stored.author_id
+        moderator = None
+        if author:
+            try:
+                entry = await self.audit_logs.find(guild, discord.AuditLogAction.message_delete, author.id)
+                if entry:
+                    moderator = entry.user
+            except discord.Forbidden:
+                pass
+        contentfield = stored.content
+        if stored.has_files:
+            contentfield = f"{stored.content}\n//The message contained a file."
+        channel_mention = channel.mention if channel else f"<#{payload.channel_id}>"
+        if moderator != None:
+            embed = discord.Embed(title=f"🗑️ Message deleted by Moderator", description=f"**Message author:** `{author_name}`\n**Moderator:** `{moderator} ({moderator.id})`\n**Channel:** {channel_mention}\n**Message content:** ```{contentfield}```", color=self.bot.errorColor)
+            await self.log_elevated(embed, guild.id, event_type="message_delete", user_id=stored.author_id, moderator_id=moderator.id)
+        else:
+            embed = discord.Embed(title=f"🗑️ Message deleted", description=f"**Message author:** `{author_name}`\n**Channel:** {channel_mention}\n**Message content:** ```{contentfield}```", color=self.bot.errorColor)
+            await self.log_standard(embed, guild.id, event_type="message_delete", user_id=stored.author_id)
 
     #Message editing logging
 
@@ -114,274 +867,373 @@ class Logging(commands.Cog):
     async def on_message_edit(self, before, after):
         if after.guild == None :
             return
+        if not await self.is_enabled(after.guild.id, "message_edit"):
+            return
         #Do this check to avoid embed edits triggering log
         if before.content == after.content:
-            self.bot.recentlyEdited.append(after.id)
             return
-        #Add it to the recently deleted so on_raw_message_edit will ignore this
-        self.bot.recentlyEdited.append(after.id)
+        if after.id in self.messages.messages:
+            self.messages.put(after.id, after.author.id, after.channel.id, after.content, bool(after.attachments))
         #Then do info collection & dump
         if after.author != self.bot.user :
             embed = discord.Embed(title=f"🖊️ Message edited", description=f"**Message author:** `{after.author} ({after.author.id})`\n**Channel:** {after.channel.mention}\n**Before:** ```{before.content}``` \n**After:** ```{after.content}```\n[Jump!]({after.jump_url})", color=self.bot.embedBlue)
-            await self.log_standard(embed, after.guild.id)
+            await self.log_standard(embed, after.guild.id, event_type="message_edit", user_id=after.author.id)
 
     #This will get called on every message edit regardless of cached state
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload):
         if payload.guild_id == None :
             return
-        #Wait for on_message_edit to complete
-        await asyncio.sleep(1)
-        #If it is in the list, we remove it and stop
-        if payload.message_id in self.bot.recentlyEdited :
-            self.bot.recentlyEdited.remove(payload.message_id)
+        #If the message was cached, on_message_edit is dispatched right after this and handles it, so we stop
+        #discord.py sets cached_message before dispatching either event, so there is nothing to wait for
+        if payload.cached_message is not None:
+            return
+        if not await self.is_enabled(payload.guild_id, "message_edit"):
             return
         #Else it is not cached, so we run the logic related to producing a generic edit message.
-        else :
-            guild = self.bot.get_guild(payload.guild_id)
-            channel = guild.get_channel(payload.channel_id)
-            message = await channel.fetch_message(payload.message_id)
-            embed = discord.Embed(title=f"🖊️ Message edited", description=f"**Channel:** {channel.mention}\n**Message author:** `{message.author} ({message.author.id})`\n\n**Message contents were not cached.**\n\n**Current content**: ```{message.content}```\n[Jump!]({message.jump_url})", color=self.bot.embedBlue)
-            await self.log_standard(embed, guild.id)
+        data = payload.data
+        #Embed-only updates (e.g. link previews resolving) do not touch the edit timestamp, these are not edits
+        if not data.get("edited_timestamp"):
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        channel = guild.get_channel(payload.channel_id) if guild else None
+        if channel is None:
+            return
+        stored = self.messages.get(payload.message_id)
+        #Pins, flag changes & late embed updates of a message edited long ago carry its old edit timestamp,
+        #without a stored copy to compare the content against, only a fresh edit timestamp tells a real edit apart
+        if stored is None:
+            edited_at = discord.utils.parse_time(data["edited_timestamp"])
+            if datetime.datetime.utcnow() - edited_at > datetime.timedelta(seconds=self.edit_max_age):
+                return
+        #The payload normally carries the full message, only fetch it if it does not
+        if "content" in data and "author" in data:
+            self.payload_edits += 1
+            author = discord.User(state=self.bot._connection, data=data["author"])
+            content = data["content"]
+            jump_url = f"https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}"
+        else:
+            self.edit_fetch_fallbacks += 1
+            try:
+                message = await channel.fetch_message(payload.message_id)
+            except discord.HTTPException:
+                return
+            author = message.author
+            content = message.content
+            jump_url = message.jump_url
+        if author.id == self.bot.user.id:
+            return
+        if stored:
+            if stored.content == content:
+                return
+            before = stored.content
+            self.messages.put(payload.message_id, stored.author_id, stored.channel_id, content, stored.has_files)
+            embed = discord.Embed(title=f"🖊️ Message edited", description=f"**Message author:** `{author} ({author.id})`\n**Channel:** {channel.mention}\n**Before:** ```{before}``` \n**After:** ```{content}```\n[Jump!]({jump_url})", color=self.bot.embedBlue)
+        else:
+            embed = discord.Embed(title=f"🖊️ Message edited", description=f"**Channel:** {channel.mention}\n**Message author:** `{author} ({author.id})`\n\n**Message contents were not cached.**\n\n**Current content**: ```{content}```\n[Jump!]({jump_url})", color=self.bot.embedBlue)
+        await self.log_standard(embed, guild.id, event_type="message_edit", user_id=author.id)
 
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(self, payload):
         if payload.guild_id == None:
             return
+        if not await self.is_enabled(payload.guild_id, "bulk_delete"):
+            return
     #Produce bulk msg generic log
+        moderator = "Undefined"
+        mod_id = None
         try:
-            moderator = "Undefined" 
             guild = self.bot.get_guild(payload.guild_id)
-            async for entry in guild.audit_logs(): #Get the bot that did it
-                if entry.action == discord.AuditLogAction.message_bulk_delete:
-                    moderator = entry.user
-                    mod_id = moderator.id
-                    break
-                else :
-                    break
+            #Get the bot that did it, bulk deletes target the channel
+            entry = await self.audit_logs.find(guild, discord.AuditLogAction.message_bulk_delete, payload.channel_id)
+            if entry:
+                moderator = entry.user
+                mod_id = moderator.id
         except discord.Forbidden:
-            mod_id = None
+            pass
         guild = self.bot.get_guild(payload.guild_id)
         channel = guild.get_channel(payload.channel_id)
-        embed = discord.Embed(title=f"🗑️ Bulk message deletion", description=f"**Channel:** {channel.mention}\n**Mod-Bot:** `{moderator} ({mod_id})`\n```Multiple messages have been purged.```", color=self.bot.errorColor)
-        await self.log_elevated(embed, payload.guild_id)
+        #Collect whatever is known about the purged messages, from discord.py's cache first, then the message store
+        cached = {message.id: message for message in payload.cached_messages}
+        transcript_entries = []
+        for message_id in sorted(payload.message_ids):
+            stored = self.messages.pop(message_id)
+            if message_id in cached:
+                message = cached[message_id]
+                transcript_entries.append((message_id, str(message.author), message.author.id, message.content, [attachment.url for attachment in message.attachments]))
+            elif stored:
+                author = guild.get_member(stored.author_id)
+                transcript_entries.append((message_id, str(author) if author else "Unknown", stored.author_id, stored.content, ["(file)"] if stored.has_files else []))
+        file = None
+        if transcript_entries:
+            #Rendering can take a while for big purges, so it is done outside the event loop
+            transcript = await self.bot.loop.run_in_executor(None, self.render_transcript, channel.name, transcript_entries)
+            file = discord.File(io.BytesIO(transcript), filename=f"purge_{payload.channel_id}_{max(payload.message_ids)}.txt")
+        embed = discord.Embed(title=f"🗑️ Bulk message deletion", description=f"**Channel:** {channel.mention}\n**Mod-Bot:** `{moderator} ({mod_id})`\n**Messages purged:** `{len(payload.message_ids)}`\n**Messages in transcript:** `{len(transcript_entries)}`", color=self.bot.errorColor)
+        await self.log_elevated(embed, payload.guild_id, event_type="bulk_delete", moderator_id=mod_id, file=file)
+
+    @staticmethod
+    def render_transcript(channel_name, entries):
+        '''
+        Renders a list of (message_id, author, author_id, content, attachments) as a plain text transcript, returns it encoded
+        '''
+        lines = [f"Transcript of {len(entries)} messages purged from #{channel_name}", ""]
+        for message_id, author, author_id, content, attachments in entries:
+            sent_at = discord.utils.snowflake_time(message_id).strftime("%Y-%m-%d %H:%M:%S")
+            lines.append(f"[{sent_at} UTC] {author} ({author_id}): {content}")
+            for attachment in attachments:
+                lines.append(f"    Attachment: {attachment}")
+        return "\n".join(lines).encode("utf-8")
+
     #Does not work, idk why but this event is never called
     @commands.Cog.listener()
     async def on_invite_delete(self, invite):
+        if not await self.is_enabled(invite.guild.id, "invite_delete"):
+            return
         embed = discord.Embed(title=f"🗑️ Invite deleted", description=f"**Invite:** `{invite}`", color=self.bot.errorColor)
-        await self.log_standard(embed, invite.guild.id)
+        await self.log_standard(embed, invite.guild.id, event_type="invite_delete")
     
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role):
+        if not await self.is_enabled(role.guild.id, "role_delete"):
+            return
         try:
-            moderator = "Undefined"
-            async for entry in role.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.role_delete:
-                    if entry.target == role or entry.target.id == role.id :
-                        moderator = entry.user
-                        break
-                else :
-                    break
+            moderator = None
+            entry = await self.audit_logs.find(role.guild, discord.AuditLogAction.role_delete, role.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             return
-        embed = discord.Embed(title=f"🗑️ Role deleted", description=f"**Role:** `{role}`\n**Moderator:** `{moderator} ({moderator.id})`", color=self.bot.errorColor)
-        await self.log_elevated(embed, role.guild.id)
+        embed = discord.Embed(title=f"🗑️ Role deleted", description=f"**Role:** `{role}`\n**Moderator:** `{moderator or 'Undefined'} ({getattr(moderator, 'id', '-')})`", color=self.bot.errorColor)
+        await self.log_elevated(embed, role.guild.id, event_type="role_delete", moderator_id=getattr(moderator, "id", None))
     
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel):
+        if not await self.is_enabled(channel.guild.id, "channel_delete"):
+            return
         try:
-            moderator = "Undefined"
-            async for entry in channel.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.channel_delete:
-                    if entry.target == channel or entry.target.id == channel.id :
-                        moderator = entry.user
-                        break
-                else :
-                    break
+            moderator = None
+            entry = await self.audit_logs.find(channel.guild, discord.AuditLogAction.channel_delete, channel.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             return
-        embed = discord.Embed(title=f"#️⃣ Channel deleted", description=f"**Channel:** `{channel.name}` ({channel.type})\n**Moderator:** `{moderator} ({moderator.id})`", color=self.bot.errorColor)
-        await self.log_elevated(embed, channel.guild.id)
+        embed = discord.Embed(title=f"#️⃣ Channel deleted", description=f"**Channel:** `{channel.name}` ({channel.type})\n**Moderator:** `{moderator or 'Undefined'} ({getattr(moderator, 'id', '-')})`", color=self.bot.errorColor)
+        await self.log_elevated(embed, channel.guild.id, event_type="channel_delete", moderator_id=getattr(moderator, "id", None))
     
     #Creation
 
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel):
+        if not await self.is_enabled(channel.guild.id, "channel_create"):
+            return
         try:
-            moderator = "Undefined"
-            async for entry in channel.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.channel_create:
-                    if entry.target == channel or entry.target.id == channel.id :
-                        moderator = entry.user
-                        break
-                else :
-                    break
+            moderator = None
+            entry = await self.audit_logs.find(channel.guild, discord.AuditLogAction.channel_create, channel.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             return
-        embed = discord.Embed(title=f"#️⃣ Channel created", description=f"**Channel:** {channel.mention} `({channel.type})`\n**Moderator:** `{moderator} ({moderator.id})`", color=self.bot.embedGreen)
-        await self.log_elevated(embed, channel.guild.id)
+        embed = discord.Embed(title=f"#️⃣ Channel created", description=f"**Channel:** {channel.mention} `({channel.type})`\n**Moderator:** `{moderator or 'Undefined'} ({getattr(moderator, 'id', '-')})`", color=self.bot.embedGreen)
+        await self.log_elevated(embed, channel.guild.id, event_type="channel_create", moderator_id=getattr(moderator, "id", None))
 
     @commands.Cog.listener()
     async def on_guild_role_create(self, role):
+        if not await self.is_enabled(role.guild.id, "role_create"):
+            return
         try:
-            moderator = "Undefined"
-            async for entry in role.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.role_create:
-                    if entry.target == role or entry.target.id == role.id :
-                        moderator = entry.user
-                        break
-                else :
-                    break
+            moderator = None
+            entry = await self.audit_logs.find(role.guild, discord.AuditLogAction.role_create, role.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             return
-        embed = discord.Embed(title=f"❇️ Role created", description=f"**Role:** `{role}`\n**Moderator:** `{moderator} ({moderator.id})`", color=self.bot.embedGreen)
-        await self.log_elevated(embed, role.guild.id)
+        embed = discord.Embed(title=f"❇️ Role created", description=f"**Role:** `{role}`\n**Moderator:** `{moderator or 'Undefined'} ({getattr(moderator, 'id', '-')})`", color=self.bot.embedGreen)
+        await self.log_elevated(embed, role.guild.id, event_type="role_create", moderator_id=getattr(moderator, "id", None))
     
     @commands.Cog.listener()
     async def on_guild_role_update(self, before, after):
+        if not await self.is_enabled(after.guild.id, "role_update"):
+            return
         try:
             moderator = None
-            async for entry in after.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.role_update:
-                    if entry.target == after or entry.target.id == after.id :
-                        moderator = entry.user
-                        break
-                else :
-                    break
+            entry = await self.audit_logs.find(after.guild, discord.AuditLogAction.role_update, after.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             return
         if moderator:
             embed = discord.Embed(title=f"🖊️ Role updated", description=f"**Role:** `{after.name}` \n**Moderator:** `{moderator} ({moderator.id})`\n**Before:**```Name: {before.name}\nColor: {before.color}\nHoisted: {before.hoist}\nManaged: {before.managed}\nMentionable: {before.mentionable}\nPosition: {before.position}\nPermissions: {before.permissions}```\n**After:**\n```Name: {after.name}\nColor: {after.color}\nHoisted: {after.hoist}\nManaged: {after.managed}\nMentionable: {after.mentionable}\nPosition:{after.position}\nPermissions: {after.permissions}```", color=self.bot.embedBlue)
-            await self.log_elevated(embed, after.guild.id)
+            await self.log_elevated(embed, after.guild.id, event_type="role_update", moderator_id=moderator.id)
 
     @commands.Cog.listener()
     async def on_guild_update(self, before, after):
+        if not await self.is_enabled(after.id, "guild_update"):
+            return
         try:
-            moderator = "Undefined"
-            async for entry in after.audit_logs():
-                if entry.action == discord.AuditLogAction.guild_update:
-                    moderator = entry.user
-                    break
-                else :
-                    break
+            moderator = None
+            entry = await self.audit_logs.find(after, discord.AuditLogAction.guild_update, after.id)
+            if entry:
+                moderator = entry.user
         except discord.Forbidden:
             return
-        embed = discord.Embed(title=f"🖊️ Guild updated", description=f"Guild settings have been updated by {moderator} `({moderator.id})`.", color=self.bot.embedBlue)
-        await self.log_elevated(embed, after.id)
+        embed = discord.Embed(title=f"🖊️ Guild updated", description=f"Guild settings have been updated by {moderator or 'Undefined'} `({getattr(moderator, 'id', '-')})`.", color=self.bot.embedBlue)
+        await self.log_elevated(embed, after.id, event_type="guild_update", moderator_id=getattr(moderator, "id", None))
 
     @commands.Cog.listener()
     async def on_member_ban(self, guild, user):
+        if not await self.is_enabled(guild.id, "ban"):
+            return
         try:
             moderator = "Undefined"
             reason = "Not specified"
-            async for entry in guild.audit_logs(action=discord.AuditLogAction.ban):
-                if entry.target == user :
-                    moderator = entry.user
-                    reason = entry.reason
-                    break
+            entry = await self.audit_logs.find(guild, discord.AuditLogAction.ban, user.id)
+            if entry:
+                moderator = entry.user
+                reason = entry.reason
         except discord.Forbidden:
             return
-        if entry.reason != None:
+        if reason != None:
             embed = discord.Embed(title=f"🔨 User banned", description=f"**Offender:** `{user} ({user.id})`\n**Moderator:**`{moderator}`\n**Reason:**```{reason}```", color=self.bot.errorColor)
         else :
             embed = discord.Embed(title=f"🔨 User banned", description=f"**Offender:** `{user} ({user.id})`\n**Moderator:**`{moderator}`\n**Reason:**```Not specified```", color=self.bot.errorColor)
-        await self.log_elevated(embed, guild.id)
+        await self.log_elevated(embed, guild.id, event_type="ban", user_id=user.id, moderator_id=getattr(moderator, "id", None))
 
     
     @commands.Cog.listener()
     async def on_member_unban(self, guild, user):
+        if not await self.is_enabled(guild.id, "unban"):
+            return
         try:
             moderator = "Undefined"
-            async for entry in guild.audit_logs(action=discord.AuditLogAction.unban):
-                if entry.target == user :
-                    moderator = entry.user
-                    reason = entry.reason
-                    break
+            reason = None
+            entry = await self.audit_logs.find(guild, discord.AuditLogAction.unban, user.id)
+            if entry:
+                moderator = entry.user
+                reason = entry.reason
         except discord.Forbidden:
             return
         embed = discord.Embed(title=f"🔨 User unbanned", description=f"**Offender:** `{user} ({user.id})`\n**Moderator:**`{moderator}`\n**Reason:** ```{reason}```", color=self.bot.embedGreen)
-        await self.log_elevated(embed, guild.id)
+        await self.log_elevated(embed, guild.id, event_type="unban", user_id=user.id, moderator_id=getattr(moderator, "id", None))
 
     @commands.Cog.listener()
     async def on_member_remove(self, member):
+        if not await self.is_enabled(member.guild.id, "leave", "kick"):
+            return
         try:
             moderator = "Undefined"
             reason = "Not specified"
-            async for entry in member.guild.audit_logs():
-                if entry.action == discord.AuditLogAction.kick:
-                    if entry.target == member :
-                        moderator = entry.user
-                        reason = entry.reason
-                        break
-                else :
-                    break
+            entry = await self.audit_logs.find(member.guild, discord.AuditLogAction.kick, member.id)
+            if entry:
+                moderator = entry.user
+                reason = entry.reason
         except discord.Forbidden:
             pass
         #If we have not found a kick auditlog
         if moderator == "Undefined":
             embed = discord.Embed(title=f"🚪 User left", description=f"**User:** `{member} ({member.id})`\n**User count:** `{member.guild.member_count}`", color=self.bot.errorColor)
-            await self.log_standard(embed, member.guild.id)
+            await self.log_standard(embed, member.guild.id, event_type="leave", user_id=member.id)
         #If we did
         else :
-            if entry.reason != None :
+            if reason != None :
                 embed = discord.Embed(title=f"🚪👈 User was kicked", description=f"**Offender:** `{member} ({member.id})`\n**Moderator:**`{moderator}`\n**Reason:**```{reason}```", color=self.bot.errorColor)
             else :
                 embed = discord.Embed(title=f"🚪👈 User was kicked", description=f"**Offender:** `{member} ({member.id})`\n**Moderator:**`{moderator}`\n**Reason:**```Not specified```", color=self.bot.errorColor)
-            await self.log_elevated(embed, member.guild.id)
+            await self.log_elevated(embed, member.guild.id, event_type="kick", user_id=member.id, moderator_id=moderator.id)
                 
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
+        if not await self.is_enabled(member.guild.id, "join", "join_storm"):
+            return
+        if self.joins.record(member):
+            return #Logged in the next join storm summary
         embed = discord.Embed(title=f"🚪 User joined", description=f"**User:** `{member} ({member.id})`\n**User count:** `{member.guild.member_count}`", color=self.bot.embedGreen)
-        await self.log_standard(embed, member.guild.id)
+        await self.log_standard(embed, member.guild.id, event_type="join", user_id=member.id)
     
     @commands.Cog.listener()
     async def on_command(self, ctx):
         if ctx.guild == None:
             return
+        if not await self.is_enabled(ctx.guild.id, "command"):
+            return
         if len(ctx.message.content) >= 1000: #Slicing for sanity lol
             cmdmsg = ctx.message.content[slice(1000)] + "..."
         else:
             cmdmsg = ctx.message.content
         embed = discord.Embed(title=f"☎️ Command called", description=f"**User:** `{ctx.author} ({ctx.author.id})`\n**Channel:** {ctx.channel.mention}\n**Command:** `{cmdmsg}`\n\n[Jump!]({ctx.message.jump_url})", color=self.bot.embedBlue)
-        await self.log_standard(embed, ctx.guild.id)
+        await self.log_standard(embed, ctx.guild.id, event_type="command", user_id=ctx.author.id)
     
     @commands.Cog.listener()
     async def on_member_update(self, before, after):
-        if before.nick != after.nick:
-            embed = discord.Embed(title=f"🖊️ Nickname changed", description=f"**User:** `{after.name} ({after.id})`\nNickname before: `{before.nick}`\nNickname after: `{after.nick}`", color=self.bot.embedBlue)
-            await self.log_standard(embed, after.guild.id)
-        elif before.roles != after.roles:
-            #Contains role that was added to user if any
-            add_diff = list(set(after.roles)-set(before.roles))
-            #Contains role that was removed from user if any
-            rem_diff = list(set(before.roles)-set(after.roles))
-            #Checking Auditlog for moderator who did it, if applicable
-            try:
-                moderator = "Undefined"
-                async for entry in after.guild.audit_logs():
-                    if entry.action == discord.AuditLogAction.member_role_update:
-                        if entry.target == after :
-                            moderator = entry.user
-                            break
-                    else :
-                        break
-            except discord.Forbidden:
-                return
-            if len(add_diff) != 0 :
-                embed = discord.Embed(title=f"🖊️ Member roles updated", description=f"**User:** `{after.name}#{after.discriminator} ({after.id})`\n**Moderator:** `{moderator.name}#{moderator.discriminator} ({moderator.id})`\n**Role added:** `{add_diff[0]}`", color=self.bot.embedBlue)
-            elif len(rem_diff) != 0 :
-                embed = discord.Embed(title=f"🖊️ Member roles updated", description=f"**User:** `{after.name}#{after.discriminator} ({after.id})`\n**Moderator:** `{moderator.name}#{moderator.discriminator} ({moderator.id})`\n**Role removed:** `{rem_diff[0]}`", color=self.bot.embedBlue)
-            #Role updates are considered elevated due to importance
-            if moderator.id == self.bot.user.id:
-                await self.log_standard(embed, after.guild.id)
-            else:
-                await self.log_elevated(embed, after.guild.id)
-        
+        nickname = before.nick != after.nick and await self.is_enabled(after.guild.id, "nickname")
+        roles = before.roles != after.roles and await self.is_enabled(after.guild.id, "roles")
+        if nickname or roles:
+            #Logged as a summary together with other changes happening around the same time
+            self.member_changes.add(before, after, roles=roles, nickname=nickname)
         elif before.pending != after.pending:
+            if not await self.is_enabled(after.guild.id, "member_state"):
+                return
             embed = discord.Embed(title=f"🖊️ Member state changed", description=f"**User:** `{after.name} ({after.id})`\n`Pending: {before.pending}` ---> `Pending: {after.pending}`", color=self.bot.embedBlue)
-            await self.log_standard(embed, after.guild.id)
+            await self.log_standard(embed, after.guild.id, event_type="member_state", user_id=after.id)
+
+    @commands.group(aliases=["modlogs"], help="Searches this server's log history. See subcommands for usage.", description="Searches every event that was logged on this server. Use `modlog search` to filter by user, event type & age.", usage="modlog search [user:<user>] [type:<event>] [since:<duration>]", invoke_without_command=True, case_insensitive=True)
+    @commands.check(hasPriviliged)
+    @commands.guild_only()
+    async def modlog(self, ctx):
+        embed=discord.Embed(title="🔍 Moderation log", description=f"**Usage:** `{ctx.prefix}modlog search [user:<user>] [type:<event>] [since:<duration>]`\n**Example:** `{ctx.prefix}modlog search user:163979124820541440 type:ban since:7d`\n\n**Event types:** {', '.join(f'`{event_type}`' for event_type in self.event_types)}", color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
+
+    def _since(self, value):
+        '''
+        Converts a duration like 7d to the point in time that long ago, returns None if it lies before the earliest representable date
+        '''
+        unit = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}[value[-1]]
+        try:
+            return datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(**{unit: int(value[:-1])})
+        except OverflowError:
+            return None
+
+    @modlog.command(name="search", help="Searches this server's log history.", description="Searches every event that was logged on this server, newest first. All filters are optional.\n\n**Filters:**\n`user:<user>` - Events about a user\n`type:<event>` - Events of a type, see `modlog` for all types\n`since:<duration>` - Events in the last duration, e.g. `30m`, `12h`, `7d` or `2w`", usage="modlog search [user:<user>] [type:<event>] [since:<duration>]")
+    @commands.check(hasPriviliged)
+    @commands.guild_only()
+    async def modlog_search(self, ctx, *, filters:str=""):
+        conditions = ["guild_id = $1"]
+        args = [ctx.guild.id]
+        for search_filter in filters.split():
+            key, _, value = search_filter.partition(":")
+            key = key.lower()
+            since = self._since(value) if key == "since" and re.fullmatch(r"\d{1,9}[smhdw]", value) else None
+            if key == "user" and re.fullmatch(r"<@!?(\d+)>|\d+", value):
+                args.append(int(re.sub(r"\D", "", value)))
+                conditions.append(f"user_id = ${len(args)}")
+            elif key == "type" and value.lower() in self.event_types:
+                args.append(value.lower())
+                conditions.append(f"event_type = ${len(args)}")
+            elif since:
+                args.append(since)
+                conditions.append(f"created_at >= ${len(args)}")
+            else:
+                embed=discord.Embed(title=self.bot.errorDataTitle, description=f"Invalid filter `{search_filter}`. Type `{ctx.prefix}help modlog search` for usage.", color=self.bot.errorColor)
+                await ctx.send(embed=embed)
+                return
+        #Keyset pagination, every page continues after the last row of the previous page
+        query = f'''
+        SELECT id, event_type, user_id, moderator_id, content, created_at FROM mod_log_events
+        WHERE {" AND ".join(conditions)} AND (created_at, id) < (${len(args) + 1}, ${len(args) + 2})
+        ORDER BY created_at DESC, id DESC LIMIT ${len(args) + 3}'''
+        pages = menus.MenuPages(source=ModLogSource(self.bot, query, args), clear_reactions_after=True)
+        await pages.start(ctx)
+
+    @commands.command(hidden=True, help="Shows log queue statistics.", description="Shows how many log entries are waiting to be sent, and how long it took for them to be sent recently.", usage="logstats")
+    @commands.is_owner()
+    async def logstats(self, ctx):
+        latencies = sorted(self.sink.flush_latencies)
+        p99 = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2) if latencies else 0
+        avg = round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0
+        embed=discord.Embed(title="📊 Log queue", description=f"**Queued entries:** `{self.sink.queue_depth}` in `{len(self.sink.queues)}` channels\n**Suppressed entries:** `{sum(self.sink.suppressed.values())}`\n**Flush latency:** avg `{avg}ms` p99 `{p99}ms`\n**Audit log requests:** `{self.audit_logs.requests}` for `{self.audit_logs.lookups}` lookups\n**Uncached edits:** `{self.payload_edits}` from payload, `{self.edit_fetch_fallbacks}` fetched\n**Message store:** `{len(self.messages.messages)}` messages, `{round(self.messages.size / 1048576, 2)}`/`{round(self.messages.max_bytes / 1048576, 2)}`MB, `{self.messages.hits}` hits, `{self.messages.misses}` misses\n**Event store:** `{len(self.events.queue)}` queued, `{self.events.written}` written, `{self.events.dropped}` dropped", color=self.bot.embedBlue)
+        await ctx.send(embed=embed)
 
 def setup(bot):
     logging.info("Adding cog: Logging...")
@@ -0,0 +1,208 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+#Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+#The measurement of the listener or command that is currently running in this task, if any
+current_measurement = contextvars.ContextVar("current_measurement", default=None)
+
+
+class Measurement():
+    '''
+    Time spent in the database & the Discord API by a single listener or command run
+    '''
+    __slots__ = ("parent", "db_time", "http_time", "failed")
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.db_time = 0.0
+        self.http_time = 0.0
+        self.failed = False
+
+def record_db_time(duration):
+    measurement = current_measurement.get()
+    if measurement:
+        measurement.db_time += duration
+
+def record_http_time(duration):
+    measurement = current_measurement.get()
+    if measurement:
+        measurement.http_time += duration
+
+def instrument_http(http):
+    '''
+    Wraps the request method of a discord.py HTTPClient, so time spent in API calls is attributed to the running listener or command
+    '''
+    request = http.request
+    async def timed_request(route, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await request(route, **kwargs)
+        finally:
+            record_http_time(time.perf_counter() - start)
+    http.request = timed_request
+
+
+@dataclass
+class HandlerStats:
+    '''
+    Represents the execution statistics of a listener or command, times are in seconds
+    '''
+    count:int=0
+    errors:int=0
+    wall_time:float=0.0
+    db_time:float=0.0
+    http_time:float=0.0
+    buckets:list=field(default_factory=lambda: [0] * len(BUCKETS))
+
+    def add(self, wall_time, db_time, http_time, failed):
+        self.count += 1
+        self.errors += int(failed)
+        self.wall_time += wall_time
+        self.db_time += db_time
+        self.http_time += http_time
+        for i, bound in enumerate(BUCKETS):
+            if wall_time <= bound:
+                self.buckets[i] += 1
+                break
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.wall_time += other.wall_time
+        self.db_time += other.db_time
+        self.http_time += other.http_time
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, percentile):
+        '''
+        Returns the upper bound of the bucket the given percentile falls into
+        '''
+        target = self.count * percentile / 100
+        seen = 0
+        for i, amount in enumerate(self.buckets):
+            seen += amount
+            if seen >= target and amount:
+                return BUCKETS[i]
+        return 0.0
+
+
+class PerfMetrics():
+    '''
+    Collects the execution time of all listeners & commands, along with the time they spent in the database & the Discord API
+    Keeps totals since startup for exporting, and per-minute statistics for the last hour
+    '''
+
+    slot_length = 60
+    slot_count = 60
+
+    def __init__(self):
+        self.totals = {} #In the format of (kind, name):HandlerStats
+        self.slots = deque(maxlen=self.slot_count) #In the format of (slot_start, {(kind, name):HandlerStats})
+
+    @contextmanager
+    def measure(self, kind, name):
+        '''
+        Times the code inside, kind is either "listener" or "command"
+        Nested measurements also count towards the database & API time of the outer one, e.g. a command invoked from on_message
+        '''
+        measurement = Measurement(parent=current_measurement.get())
+        token = current_measurement.set(measurement)
+        start = time.perf_counter()
+        try:
+            yield measurement
+        except Exception:
+            measurement.failed = True
+            raise
+        finally:
+            current_measurement.reset(token)
+            self.record(kind, name, time.perf_counter() - start, measurement.db_time, measurement.http_time, measurement.failed)
+            if measurement.parent:
+                measurement.parent.db_time += measurement.db_time
+                measurement.parent.http_time += measurement.http_time
+
+    def record(self, kind, name, wall_time, db_time=0.0, http_time=0.0, failed=False):
+        key = (kind, name)
+        slot_start = int(time.time() // self.slot_length * self.slot_length)
+        if not self.slots or self.slots[-1][0] != slot_start:
+            self.slots.append((slot_start, {}))
+        slot = self.slots[-1][1]
+        for stats in (self.totals, slot):
+            if key not in stats:
+                stats[key] = HandlerStats()
+            stats[key].add(wall_time, db_time, http_time, failed)
+
+    def window(self, seconds=3600):
+        '''
+        Returns the statistics of the last seconds merged, in the format of (kind, name):HandlerStats
+        '''
+        since = time.time() - seconds
+        merged = {}
+        for slot_start, slot in self.slots:
+            if slot_start + self.slot_length < since:
+                continue
+            for key, stats in slot.items():
+                if key not in merged:
+                    merged[key] = HandlerStats()
+                merged[key].merge(stats)
+        return merged
+
+    def slowest(self, amount=10, seconds=3600):
+        '''
+        Returns the slowest listeners & commands of the last seconds by p99, as a list of ((kind, name), HandlerStats)
+        '''
+        stats = self.window(seconds)
+        return sorted(stats.items(), key=lambda item: (item[1].percentile(99), item[1].wall_time), reverse=True)[:amount]
+
+    def prometheus_text(self):
+        '''
+        Returns the totals since startup in the Prometheus text exposition format
+        '''
+        lines = [
+            "# HELP sned_handler_duration_seconds Execution time of listeners & commands.",
+            "# TYPE sned_handler_duration_seconds histogram",
+        ]
+        for (kind, name), stats in self.totals.items():
+            labels = f'kind="{kind}",handler="{name}"'
+            cumulative = 0
+            for bound, amount in zip(BUCKETS, stats.buckets):
+                cumulative += amount
+                le = "+Inf" if bound == float("inf") else str(bound)
+                lines.append(f'sned_handler_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"sned_handler_duration_seconds_sum{{{labels}}} {stats.wall_time}")
+            lines.append(f"sned_handler_duration_seconds_count{{{labels}}} {stats.count}")
+        for metric, attribute, description in [
+            ("sned_handler_db_seconds_total", "db_time", "Time listeners & commands spent in the database."),
+            ("sned_handler_http_seconds_total", "http_time", "Time listeners & commands spent in Discord API calls."),
+            ("sned_handler_errors_total", "errors", "Listener & command runs that raised an error."),
+        ]:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} counter")
+            for (kind, name), stats in self.totals.items():
+                lines.append(f'{metric}{{kind="{kind}",handler="{name}"}} {getattr(stats, attribute)}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        #Write to a temporary file first, so the scraper never reads a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+    async def export_loop(self, path, interval=60):
+        '''
+        Writes the Prometheus text file every interval seconds
+        '''
+        while True:
+            try:
+                self.write_prometheus(path)
+            except OSError as error:
+                logging.error(f"Failed writing metrics to {path}: {error}")
+            await asyncio.sleep(interval)
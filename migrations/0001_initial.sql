@@ -0,0 +1,136 @@
+-- Initial schema, matches the tables previously created by the extensions on every boot.
+-- Uses IF NOT EXISTS so databases created before migrations were introduced can adopt this version.
+
+CREATE TABLE IF NOT EXISTS public.global_config
+(
+    guild_id bigint NOT NULL,
+    prefix text[],
+    PRIMARY KEY (guild_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.users
+(
+    user_id bigint NOT NULL,
+    guild_id bigint NOT NULL,
+    flags text[],
+    warns integer NOT NULL DEFAULT 0,
+    is_muted bool NOT NULL DEFAULT false,
+    notes text,
+    PRIMARY KEY (user_id, guild_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.priviliged
+(
+    guild_id bigint NOT NULL,
+    priviliged_role_id bigint NOT NULL,
+    PRIMARY KEY (guild_id, priviliged_role_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.mod_config
+(
+    guild_id bigint,
+    mute_role_id bigint,
+    PRIMARY KEY (guild_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.log_config
+(
+    guild_id bigint NOT NULL,
+    log_channel_id bigint NOT NULL,
+    elevated_log_channel_id bigint,
+    PRIMARY KEY (guild_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.timers
+(
+    id serial NOT NULL,
+    guild_id bigint NOT NULL,
+    user_id bigint NOT NULL,
+    channel_id bigint,
+    event text NOT NULL,
+    expires bigint NOT NULL,
+    notes text,
+    PRIMARY KEY (id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.tags
+(
+    guild_id bigint NOT NULL,
+    tag_name text NOT NULL,
+    tag_owner_id bigint NOT NULL,
+    tag_aliases text[],
+    tag_content text NOT NULL,
+    PRIMARY KEY (guild_id, tag_name),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.matchmaking_config
+(
+    guild_id bigint,
+    init_channel_id bigint,
+    announce_channel_id bigint,
+    PRIMARY KEY (guild_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.matchmaking_listings
+(
+    id text,
+    ubiname text NOT NULL,
+    host_id bigint NOT NULL,
+    gamemode text NOT NULL,
+    playercount text NOT NULL,
+    DLC text NOT NULL,
+    mods text NOT NULL,
+    timezone text NOT NULL,
+    additional_info text NOT NULL,
+    timestamp bigint NOT NULL,
+    guild_id bigint NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS public.reaction_roles
+(
+    guild_id bigint NOT NULL,
+    reactionrole_id serial NOT NULL,
+    reactionrole_channel_id bigint NOT NULL,
+    reactionrole_msg_id bigint NOT NULL,
+    reactionrole_emoji_id bigint NOT NULL,
+    reactionrole_role_id bigint NOT NULL,
+    PRIMARY KEY (guild_id, reactionrole_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS public.ktp
+(
+    guild_id bigint NOT NULL,
+    ktp_id serial NOT NULL,
+    ktp_channel_id bigint NOT NULL,
+    ktp_msg_id bigint NOT NULL,
+    ktp_content text NOT NULL,
+    PRIMARY KEY (guild_id, ktp_id),
+    FOREIGN KEY (guild_id)
+        REFERENCES global_config (guild_id)
+        ON DELETE CASCADE
+);
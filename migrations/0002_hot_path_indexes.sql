@@ -0,0 +1,7 @@
+-- Indexes for queries that run on every timer dispatch & tag lookup.
+
+-- Timers are always fetched in order of expiry
+CREATE INDEX IF NOT EXISTS timers_expires_idx ON public.timers (expires);
+
+-- Tag aliases are looked up with tag_aliases @> ARRAY[alias]
+CREATE INDEX IF NOT EXISTS tags_tag_aliases_idx ON public.tags USING gin (tag_aliases);
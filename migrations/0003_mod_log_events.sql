@@ -0,0 +1,17 @@
+-- Every entry produced by the logging extension, so moderators can search a guild's history via the modlog command.
+
+-- Partitioned by month, partitions are created by the bot as they are needed, and old history can be dropped a partition at a time
+CREATE TABLE IF NOT EXISTS public.mod_log_events
+(
+    id bigserial NOT NULL,
+    guild_id bigint NOT NULL,
+    event_type text NOT NULL,
+    user_id bigint,
+    moderator_id bigint,
+    content text,
+    created_at timestamp with time zone NOT NULL DEFAULT now()
+) PARTITION BY RANGE (created_at);
+
+-- Searches are always within a guild, by user and/or event type, newest first
+CREATE INDEX IF NOT EXISTS mod_log_events_user_idx ON public.mod_log_events (guild_id, user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS mod_log_events_type_idx ON public.mod_log_events (guild_id, event_type, created_at DESC, id DESC);
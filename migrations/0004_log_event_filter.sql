@@ -0,0 +1,3 @@
+-- Bitmask of the event types a guild wants logged, bits are in the order of Logging.event_types in extensions/userlog.py.
+-- -1 has every bit set, so existing guilds, and event types added later, are logged by default.
+ALTER TABLE public.log_config ADD COLUMN IF NOT EXISTS log_events bigint NOT NULL DEFAULT -1;
@@ -0,0 +1,5 @@
+-- Lets multiple bot processes dispatch timers without delivering any timer twice.
+-- A process claims due timers by setting claimed_by to its instance ID, and claimed_until to when its lease runs out,
+-- timers are deleted once they were dispatched, so timers whose lease expired were not delivered & can be claimed again.
+ALTER TABLE public.timers ADD COLUMN IF NOT EXISTS claimed_by text;
+ALTER TABLE public.timers ADD COLUMN IF NOT EXISTS claimed_until bigint;
@@ -0,0 +1,22 @@
+-- Announces changes to the timers table on the 'timers' channel, so every bot process listening schedules
+-- timers created by another process, an admin tool or a migration right away, instead of on its next refill.
+-- Notes are left out of the payload, as notifications are limited to 8000 bytes.
+-- Deleting a claimed timer after it was dispatched is not announced, the claiming process already unscheduled it.
+CREATE OR REPLACE FUNCTION public.notify_timers() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('timers', json_build_object('op', TG_OP, 'id', OLD.id)::text);
+        RETURN OLD;
+    END IF;
+    PERFORM pg_notify('timers', json_build_object('op', TG_OP, 'id', NEW.id, 'guild_id', NEW.guild_id, 'user_id', NEW.user_id,
+        'channel_id', NEW.channel_id, 'event', NEW.event, 'expires', NEW.expires)::text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS timers_notify_upsert ON public.timers;
+CREATE TRIGGER timers_notify_upsert AFTER INSERT OR UPDATE OF expires ON public.timers
+    FOR EACH ROW EXECUTE PROCEDURE public.notify_timers();
+DROP TRIGGER IF EXISTS timers_notify_delete ON public.timers;
+CREATE TRIGGER timers_notify_delete AFTER DELETE ON public.timers
+    FOR EACH ROW WHEN (OLD.claimed_by IS NULL) EXECUTE PROCEDURE public.notify_timers();
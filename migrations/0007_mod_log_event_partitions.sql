@@ -0,0 +1,15 @@
+-- Creates the partitions of mod_log_events for the current & next month, so writes do not depend on the bot creating them at runtime.
+-- Later months are still created by the bot, a month ahead of when they are needed. Names & bounds match EventStore._create_partition().
+DO $$
+DECLARE
+    partition_start date;
+BEGIN
+    FOR i IN 0..1 LOOP
+        partition_start := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => i))::date;
+        EXECUTE format('CREATE TABLE IF NOT EXISTS public.%I PARTITION OF public.mod_log_events FOR VALUES FROM (%L) TO (%L)',
+            'mod_log_events_' || to_char(partition_start, 'YYYY_MM'),
+            partition_start::text || ' 00:00+00',
+            (partition_start + interval '1 month')::date::text || ' 00:00+00');
+    END LOOP;
+END
+$$;